@@ -9,6 +9,7 @@ COUNTRY = 'in'
 # Batch Processing Configuration
 START_DATE = datetime(2025, 6, 1).date()
 DAILY_BATCH_SIZE = 200
+PHASE2_REVIEWS_PER_DAY = 100  # newest reviews per day sent to topic extraction
 
 # API Configuration
 GROQ_API_KEY = os.getenv('GROQ_API_KEY', 'YOUR_GROQ_API_KEY_HERE')
@@ -20,6 +21,7 @@ DATA_DIR = os.path.join(BASE_DIR, 'data')
 RAW_DATA_DIR = os.path.join(DATA_DIR, 'raw')
 DB_DIR = os.path.join(DATA_DIR, 'database')
 BATCH_STATUS_DIR = os.path.join(DATA_DIR, 'batch_status')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 OUTPUT_DIR = os.path.join(BASE_DIR, 'output')
 DB_PATH = os.path.join(DB_DIR, 'reviews.db')
 
@@ -27,12 +29,124 @@ DB_PATH = os.path.join(DB_DIR, 'reviews.db')
 os.makedirs(RAW_DATA_DIR, exist_ok=True)
 os.makedirs(DB_DIR, exist_ok=True)
 os.makedirs(BATCH_STATUS_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# SQLite Settings (reviews.db)
+SQLITE_WAL_ENABLED = True  # readers and the Phase 2 writer no longer block each other
+SQLITE_SYNCHRONOUS = 'NORMAL'  # with WAL a crash can lose the last commits, never corrupt the file
+SQLITE_CACHE_SIZE_MB = 64
+SQLITE_MMAP_SIZE_MB = 256
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+SQLITE_WRITE_BUFFER_ROWS = 5000  # buffered topic mentions per insert transaction
+INGEST_PAGE_ROWS = 50000  # raw_reviews rows per executemany page during ingest
+
+# Columnar Store Settings (date-partitioned Parquet copies for analysis)
+COLUMNAR_STORE_ENABLED = True  # skipped with a log line when pyarrow is not installed
+COLUMNAR_DIR = os.path.join(DATA_DIR, 'columnar')
+
 # Topic Extraction Settings
-REVIEWS_PER_API_CALL = 10
-API_DELAY_SECONDS = 2
 SIMILARITY_THRESHOLD = 0.85
+RECONSOLIDATION_THRESHOLD = SIMILARITY_THRESHOLD  # cosine for the offline merge job
+
+# Embedding Settings
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')  # torch | onnx | int8 (loaded on first encode)
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_THREADS = 0  # intra-op threads; 0 keeps the library default
+EMBEDDING_PARITY_CHECK = False  # compare non-torch backends with the reference model on load
+EMBEDDING_PARITY_MIN_COSINE = 0.99
+EMBEDDING_CACHE_ENABLED = True  # topic-name embeddings reused across calls and runs
+EMBEDDING_CACHE_DIR = os.path.join(CACHE_DIR, 'embeddings')
+EMBEDDING_CACHE_DTYPE = 'float16'  # float32 doubles disk use for exact vectors
+EMBEDDING_LRU_SIZE = 4096
+
+# Topic Index Settings (canonical topic lookup, cosine similarity)
+TOPIC_INDEX_BACKEND = 'numpy'  # numpy (in-process) | chroma
+TOPIC_INDEX_DIR = os.path.join(DATA_DIR, 'topic_index')
+TOPIC_INDEX_INT8 = False  # int8 rows: 4x smaller, ~0.01 cosine error
+TOPIC_INDEX_ANN_THRESHOLD = 20000  # above this many topics search IVF cells instead of every row
+TOPIC_INDEX_ANN_PROBES = 8
+
+# Chunk Packing Settings (token budget per API call)
+MODEL_CONTEXT_WINDOW = 8192  # llama3-70b-8192
+CONTEXT_SAFETY_MARGIN = 256
+LLM_MAX_OUTPUT_TOKENS = 2048
+OUTPUT_TOKENS_BASE = 64
+OUTPUT_TOKENS_PER_REVIEW = 30  # short r1..rN handles, not UUIDs, are echoed back
+MAX_REVIEWS_PER_CHUNK = 40
+TOKENIZER_ENCODING = 'cl100k_base'
+EXTRACTION_MAX_RETRIES = 2  # re-extraction rounds for reviews that got no topic
+
+# Cluster-then-label Settings
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'chunk')  # chunk (every review) | cluster (name clusters)
+CLUSTER_WINDOW_DAYS = 1  # days of reviews clustered together in cluster mode
+CLUSTER_DISTANCE_THRESHOLD = 0.35  # max average cosine distance inside a cluster
+CLUSTER_MIN_SIZE = 3  # smaller groups are extracted review by review
+CLUSTER_REPRESENTATIVES = 3  # reviews shown to the LLM per cluster
+
+# Near-duplicate Index Settings (MinHash + LSH over raw_reviews.content)
+NEAR_DUP_ENABLED = True
+MINHASH_NUM_PERM = 64
+MINHASH_BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard usually share a bucket
+MINHASH_SHINGLE_WORDS = 3
+NEAR_DUP_THRESHOLD = 0.7  # estimated Jaccard needed to join a group
+NEAR_DUP_BUCKET_CANDIDATES = 32  # stored rows compared per LSH bucket hit
+NEAR_DUP_MIN_WORDS = 4  # shorter texts ("good app", emoji-only) are too common to group
+NEAR_DUP_CAMPAIGN_MIN_SIZE = 5  # groups this large are flagged in reports
+
+# Review Search Settings (SQLite FTS5 over raw_reviews.content)
+REVIEW_SEARCH_ENABLED = True
+REVIEW_SEARCH_PAGE_SIZE = 50
+
+# Pre-extraction Short-circuit Settings
+TRIVIAL_REVIEW_MIN_INFO_WORDS = 1  # reviews with fewer topic-bearing words skip the LLM
+TRIVIAL_REVIEW_TOPIC = 'General feedback'
+TRIVIAL_REVIEW_CATEGORY = 'feedback'
+DEDUP_MEMORY_SIZE = 50000  # normalized texts remembered across days
+
+# Local Embedding Cascade Settings (seed-topic labels without the LLM)
+CASCADE_ENABLED = True
+CASCADE_MIN_SIMILARITY = 0.55  # cosine to the best seed prototype
+CASCADE_MARGIN = 0.10  # required lead over the runner-up prototype
+CASCADE_MAX_WORDS = 40
+
+# kNN Label Propagation Settings (inherit topics from labeled history)
+KNN_ENABLED = True
+KNN_K = 7
+KNN_MIN_SIMILARITY = 0.75  # mean cosine of the k neighbours
+KNN_MIN_AGREEMENT = 0.8  # share of neighbours carrying a topic
+KNN_MIN_INDEX_SIZE = 200  # labeled reviews needed before propagating
+REVIEW_INDEX_DIR = os.path.join(DATA_DIR, 'review_index')
+ENCODE_MULTIPROCESS_MIN = 5000  # texts per call before encoding uses all cores
+
+# LLM Backend Settings
+# groq | local (mock_llm_server) | record (wraps LLM_RECORD_TARGET) | replay
+# Disable LLM_CACHE_ENABLED while recording, or cache hits will not reach the recording
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'groq')
+LLM_RECORD_TARGET = os.getenv('LLM_RECORD_TARGET', 'groq')
+LLM_LOCAL_BASE_URL = os.getenv('LLM_LOCAL_BASE_URL', 'http://127.0.0.1:8008/v1/chat/completions')
+LLM_RECORDING_PATH = os.getenv('LLM_RECORDING_PATH', os.path.join(CACHE_DIR, 'llm_recording.jsonl'))
+
+# LLM Dispatch Settings
+LLM_ASYNC_ENABLED = True
+LLM_MAX_CONCURRENCY = 8
+LLM_STREAMING_ENABLED = True  # parse topics while the completion streams in
+LLM_TIMEOUT_SECONDS = 30
+
+# Rate Limit Settings (Groq free tier quota for GROQ_MODEL)
+LLM_REQUESTS_PER_MINUTE = 30
+LLM_TOKENS_PER_MINUTE = 6000
+LLM_MAX_RETRIES = 6
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 60
+
+# LLM Response Cache Settings
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, 'llm_responses.db')
+LLM_CACHE_TTL_DAYS = 30
+LLM_CACHE_MAX_MB = 256
 
 # Report Settings
 TREND_WINDOW_DAYS = 30
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Sentence-embedding backends for TopicVectorStore, loaded on first encode.
+
+    torch  - reference SentenceTransformer model
+    onnx   - same weights on ONNX Runtime (needs sentence-transformers[onnx])
+    int8   - torch model with dynamically quantized Linear layers
+
+Check a backend against the reference model before switching:
+
+    python src/ai_agents/embedding_backends.py --backend onnx
+"""
+import argparse
+import logging
+import threading
+import time
+import numpy as np
+from typing import List, Optional
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS,
+    EMBEDDING_PARITY_CHECK, EMBEDDING_PARITY_MIN_COSINE, ENCODE_MULTIPROCESS_MIN
+)
+
+logger = logging.getLogger(__name__)
+
+# Short review/topic-like strings used to compare a backend with the reference model
+PARITY_SAMPLE_TEXTS = [
+    "Delivery issue", "Food quality issue", "App technical issue", "Feature request",
+    "delivery was very late and the food was cold",
+    "app keeps crashing when I try to pay",
+    "delivery partner was rude and asked for extra money",
+    "please add an option to schedule orders",
+    "refund not received after order was cancelled",
+    "great service, always on time"
+]
+
+class SentenceTransformerBackend:
+    """Reference PyTorch backend; subclasses change how the model is loaded"""
+
+    name = 'torch'
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 threads: int = EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_name(self) -> str:
+        """Embedding cache namespace; backends whose vectors differ get their own"""
+        return self.model_name
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = self._load()
+                    logger.info(f"✅ Loaded {self.model_name} ({self.name} backend) in {time.perf_counter() - started:.1f}s")
+                    if EMBEDDING_PARITY_CHECK and self.name != 'torch':
+                        check_parity(self)
+        return self._model
+
+    def _load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        return SentenceTransformer(self.model_name, device='cpu')
+
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Unit-length float32 embeddings, one row per text"""
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype=np.float32)
+        return self.model.encode(
+            texts, batch_size=batch_size or self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+    def encode_many(self, texts: List[str], batch_size: int = 128) -> np.ndarray:
+        """Like encode(), but spreads large backfills over all CPU cores"""
+        workers = os.cpu_count() or 1
+        if len(texts) < ENCODE_MULTIPROCESS_MIN or workers < 2:
+            return self.encode(texts, batch_size=batch_size)
+
+        logger.info(f"Encoding {len(texts)} texts on {workers} processes")
+        pool = self.model.start_multi_process_pool(target_devices=['cpu'] * workers)
+        try:
+            embeddings = self.model.encode_multi_process(
+                texts, pool, batch_size=batch_size, normalize_embeddings=True
+            )
+        finally:
+            self.model.stop_multi_process_pool(pool)
+        return embeddings.astype(np.float32)
+
+class OnnxBackend(SentenceTransformerBackend):
+    name = 'onnx'
+
+    def _load(self):
+        import onnxruntime
+        from sentence_transformers import SentenceTransformer
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        return SentenceTransformer(
+            self.model_name, device='cpu', backend='onnx',
+            model_kwargs={'provider': 'CPUExecutionProvider', 'session_options': session_options}
+        )
+
+class QuantizedInt8Backend(SentenceTransformerBackend):
+    name = 'int8'
+
+    @property
+    def cache_name(self) -> str:
+        return f'{self.model_name}-int8'
+
+    def _load(self):
+        import torch
+        model = super()._load()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode_many(self, texts: List[str], batch_size: int = 128) -> np.ndarray:
+        # Quantized modules do not survive the multi-process pool's model copy
+        return self.encode(texts, batch_size=batch_size)
+
+EMBEDDING_BACKENDS = {
+    backend.name: backend for backend in (SentenceTransformerBackend, OnnxBackend, QuantizedInt8Backend)
+}
+
+def create_embedding_backend(name: str = EMBEDDING_BACKEND, **kwargs) -> SentenceTransformerBackend:
+    """torch | onnx | int8; nothing is loaded until the first encode"""
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"❌ Unknown embedding backend: {name}")
+    return EMBEDDING_BACKENDS[name](**kwargs)
+
+def check_parity(backend: SentenceTransformerBackend, reference: Optional[SentenceTransformerBackend] = None,
+                 texts: List[str] = PARITY_SAMPLE_TEXTS, min_cosine: float = EMBEDDING_PARITY_MIN_COSINE) -> dict:
+    """Cosine agreement between a backend and the reference torch model on sample texts"""
+    reference = reference or SentenceTransformerBackend(backend.model_name)
+    candidate, expected = backend.encode(texts), reference.encode(texts)
+    cosines = (candidate * expected).sum(axis=1)
+
+    # Neighbour order matters more than raw values for topic matching
+    same_neighbours = np.mean(np.argsort(-(candidate @ candidate.T), axis=1)[:, 1] ==
+                              np.argsort(-(expected @ expected.T), axis=1)[:, 1])
+
+    result = {
+        'backend': backend.name,
+        'min_cosine': float(cosines.min()),
+        'mean_cosine': float(cosines.mean()),
+        'same_nearest_neighbour': float(same_neighbours),
+        'passed': bool(cosines.min() >= min_cosine)
+    }
+    if result['passed']:
+        logger.info(f"✅ {backend.name} embeddings match the reference (min cosine {result['min_cosine']:.4f})")
+    else:
+        logger.warning(f"⚠️  {backend.name} embeddings drift from the reference: min cosine {result['min_cosine']:.4f} "
+                       f"< {min_cosine}, nearest neighbour agreement {result['same_nearest_neighbour']:.0%}")
+    return result
+
+def benchmark(backend: SentenceTransformerBackend, texts: List[str], repeats: int = 3) -> float:
+    """Texts per second after the model is loaded"""
+    backend.encode(texts[:1])
+    started = time.perf_counter()
+    for _ in range(repeats):
+        backend.encode(texts)
+    return repeats * len(texts) / (time.perf_counter() - started)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Compare an embedding backend with the reference model')
+    parser.add_argument('--backend', default=EMBEDDING_BACKEND, choices=sorted(EMBEDDING_BACKENDS))
+    parser.add_argument('--threads', type=int, default=EMBEDDING_THREADS)
+    parser.add_argument('--batch-size', type=int, default=EMBEDDING_BATCH_SIZE)
+    args = parser.parse_args()
+
+    candidate = create_embedding_backend(args.backend, threads=args.threads, batch_size=args.batch_size)
+    reference = SentenceTransformerBackend(threads=args.threads, batch_size=args.batch_size)
+    print(f"Parity: {check_parity(candidate, reference)}")
+
+    sample = PARITY_SAMPLE_TEXTS * 50
+    print(f"Throughput: {args.backend} {benchmark(candidate, sample):.0f} texts/s, "
+          f"torch {benchmark(reference, sample):.0f} texts/s")
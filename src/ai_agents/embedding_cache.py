@@ -0,0 +1,179 @@
+import logging
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Callable, Optional
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DTYPE, EMBEDDING_LRU_SIZE
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_embedding_key(text: str) -> str:
+    """Case and whitespace do not change what an uncased MiniLM model sees"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', str(text)).lower()).strip()
+
+class EmbeddingCache:
+    """
+    Append-only on-disk embedding store with an in-memory LRU in front.
+
+    Vectors live in a raw float16/float32 file read through np.memmap; a
+    parallel keys file maps each row to the hash of its normalized text.
+    Files are per model, so switching models never mixes vector spaces.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 dtype: str = EMBEDDING_CACHE_DTYPE, lru_size: int = EMBEDDING_LRU_SIZE):
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.lru_size = lru_size
+
+        slug = re.sub(r'[^\w.-]', '_', model_name)
+        cache_path = Path(cache_dir)
+        cache_path.mkdir(parents=True, exist_ok=True)
+        self.vectors_file = cache_path / f'{slug}.{self.dtype.name}'
+        self.keys_file = cache_path / f'{slug}.keys'
+        self.meta_file = cache_path / f'{slug}.json'
+
+        self.dim: Optional[int] = None
+        self.offsets = {}
+        self.rows = 0
+        self._memmap: Optional[np.memmap] = None
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    def _load(self):
+        if not (self.meta_file.exists() and self.keys_file.exists() and self.vectors_file.exists()):
+            return
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('dtype') != self.dtype.name:
+                logger.warning(f"⚠️  Embedding cache dtype changed to {self.dtype.name}, starting a new cache")
+                self._reset()
+                return
+            self.dim = meta['dim']
+
+            with open(self.keys_file, 'r', encoding='utf-8') as f:
+                keys = f.read().split()
+            rows = self.vectors_file.stat().st_size // (self.dim * self.dtype.itemsize)
+
+            # A crash between the two appends leaves one file longer; keep the common prefix
+            usable = min(rows, len(keys))
+            if usable < max(rows, len(keys)):
+                self._truncate(usable, keys[:usable])
+            self.offsets = {key: row for row, key in enumerate(keys[:usable])}
+            self.rows = usable
+            logger.info(f"✅ Embedding cache loaded: {len(self.offsets)} vectors for {self.model_name}")
+        except Exception as e:
+            logger.error(f"❌ Could not load embedding cache, starting fresh: {e}")
+            self._reset()
+
+    def _reset(self):
+        for path in (self.vectors_file, self.keys_file, self.meta_file):
+            if path.exists():
+                path.unlink()
+        self.dim = None
+        self.offsets = {}
+        self.rows = 0
+        self._memmap = None
+
+    def _truncate(self, rows: int, keys: List[str]):
+        with open(self.vectors_file, 'r+b') as f:
+            f.truncate(rows * self.dim * self.dtype.itemsize)
+        with open(self.keys_file, 'w', encoding='utf-8') as f:
+            f.write(''.join(f'{key}\n' for key in keys))
+
+    def _vectors(self) -> np.ndarray:
+        if self._memmap is None or len(self._memmap) < self.rows:
+            self._memmap = np.memmap(self.vectors_file, dtype=self.dtype, mode='r').reshape(-1, self.dim)
+        return self._memmap
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(normalize_embedding_key(text).encode('utf-8')).hexdigest()
+
+    def encode(self, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embeddings for texts, calling encoder only for texts never seen before"""
+        keys = [self._key(text) for text in texts]
+        found = {}
+
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                elif key in self.offsets:
+                    found[key] = self._remember(key, self._vectors()[self.offsets[key]])
+                else:
+                    missing[key] = text
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                # Another thread may have stored some of these while we were encoding
+                new = [i for i, key in enumerate(missing) if key not in self.offsets]
+                if new:
+                    missing_keys = list(missing)
+                    self._append([missing_keys[i] for i in new], encoded[new])
+                for key, vector in zip(missing.keys(), encoded):
+                    found[key] = self._remember(key, vector)
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.vstack([found[key] for key in keys])
+
+    def _remember(self, key: str, vector: np.ndarray) -> np.ndarray:
+        # Stored rows may be float16; hand out unit-length float32 either way
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+        return vector
+
+    def _append(self, keys: List[str], vectors: np.ndarray):
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.meta_file, 'w', encoding='utf-8') as f:
+                json.dump({'model': self.model_name, 'dim': self.dim, 'dtype': self.dtype.name}, f)
+
+        # Vectors first: an orphan row without a key is dropped on the next load.
+        # Rows are numbered from the file itself, which offsets can lag (e.g. a key stored twice).
+        with open(self.vectors_file, 'ab') as f:
+            start = f.tell() // (self.dim * self.dtype.itemsize)
+            f.write(vectors.astype(self.dtype).tobytes())
+        with open(self.keys_file, 'a', encoding='utf-8') as f:
+            f.write(''.join(f'{key}\n' for key in keys))
+
+        for row, key in enumerate(keys, start):
+            self.offsets[key] = row
+        self.rows = start + len(keys)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.offsets)
+        }
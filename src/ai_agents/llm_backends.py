@@ -0,0 +1,290 @@
+import logging
+import json
+import threading
+import requests
+import httpx
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, AsyncIterator, List
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import (
+    GROQ_API_KEY, LLM_BACKEND, LLM_LOCAL_BASE_URL, LLM_RECORDING_PATH, LLM_RECORD_TARGET,
+    LLM_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS
+)
+from .response_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+class BackendConnectionError(Exception):
+    """Transport-level failure (connect/read/timeout); safe to retry"""
+
+class BackendResult:
+    """Status, headers and decoded JSON body of one chat-completions call"""
+
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None, data: Optional[dict] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.data = data or {}
+
+class BackendStream:
+    """Status and headers of a streaming call plus an async iterator of SSE event dicts"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], events: AsyncIterator[dict]):
+        self.status_code = status_code
+        self.headers = headers
+        self.events = events
+
+class LLMBackend(ABC):
+    """Transport for OpenAI-compatible chat completions; retries, limits and caching live in LLMClient"""
+
+    name = 'base'
+
+    @abstractmethod
+    def complete(self, payload: dict) -> BackendResult:
+        ...
+
+    @abstractmethod
+    async def acomplete(self, payload: dict) -> BackendResult:
+        ...
+
+    @abstractmethod
+    def astream(self, payload: dict):
+        """Async context manager yielding a BackendStream"""
+
+    async def aclose(self):
+        pass
+
+    def cache_namespace(self) -> str:
+        """Who answers the calls; part of the response cache key"""
+        return self.name
+
+class OpenAICompatibleBackend(LLMBackend):
+    name = 'openai-compatible'
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+        # Keep-alive connection pool for sync calls
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_MAX_CONCURRENCY)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Async client is bound to an event loop, so it is created lazily per run
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def cache_namespace(self) -> str:
+        return f'{self.name} {self.base_url}'
+
+    def complete(self, payload: dict) -> BackendResult:
+        try:
+            response = self.session.post(self.base_url, json=payload, timeout=LLM_TIMEOUT_SECONDS)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise BackendConnectionError(str(e)) from e
+        return BackendResult(response.status_code, dict(response.headers), self._json_or_empty(response))
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            limits = httpx.Limits(
+                max_connections=LLM_MAX_CONCURRENCY,
+                max_keepalive_connections=LLM_MAX_CONCURRENCY
+            )
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=limits,
+                timeout=LLM_TIMEOUT_SECONDS
+            )
+        return self._async_client
+
+    async def acomplete(self, payload: dict) -> BackendResult:
+        try:
+            response = await self._get_async_client().post(self.base_url, json=payload)
+        except httpx.TransportError as e:
+            raise BackendConnectionError(str(e)) from e
+        return BackendResult(response.status_code, dict(response.headers), self._json_or_empty(response))
+
+    @asynccontextmanager
+    async def astream(self, payload: dict):
+        try:
+            async with self._get_async_client().stream('POST', self.base_url, json=dict(payload, stream=True)) as response:
+                yield BackendStream(response.status_code, dict(response.headers), self._iter_events(response))
+        except httpx.TransportError as e:
+            raise BackendConnectionError(str(e)) from e
+
+    @staticmethod
+    async def _iter_events(response: httpx.Response) -> AsyncIterator[dict]:
+        if response.status_code >= 400:
+            return
+        async for line in response.aiter_lines():
+            if not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            yield json.loads(data)
+
+    @staticmethod
+    def _json_or_empty(response) -> dict:
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    async def aclose(self):
+        """Close the async client; must run on the loop that created it"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+class GroqBackend(OpenAICompatibleBackend):
+    name = 'groq'
+
+    def __init__(self, api_key: str = GROQ_API_KEY):
+        if not api_key or api_key == 'YOUR_GROQ_API_KEY_HERE':
+            raise ValueError("❌ GROQ_API_KEY not set! Get free key from: https://console.groq.com/keys")
+        super().__init__("https://api.groq.com/openai/v1/chat/completions", api_key)
+
+class LocalBackend(OpenAICompatibleBackend):
+    """Points at mock_llm_server (or any local OpenAI-compatible server)"""
+
+    name = 'local'
+
+    def __init__(self, base_url: str = LLM_LOCAL_BASE_URL):
+        super().__init__(base_url, api_key='local')
+
+def _content_result(content: str, finish_reason: Optional[str], usage: Optional[dict]) -> dict:
+    return {
+        'choices': [{'message': {'role': 'assistant', 'content': content}, 'finish_reason': finish_reason}],
+        'usage': usage or {}
+    }
+
+class RecordingBackend(LLMBackend):
+    """Passes calls through to another backend and appends successful exchanges to a JSONL file"""
+
+    name = 'record'
+
+    def __init__(self, inner: LLMBackend, path: str = LLM_RECORDING_PATH):
+        self.inner = inner
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        logger.info(f"🎙️  Recording {inner.name} LLM calls to {self.path}")
+
+    def cache_namespace(self) -> str:
+        # Recording does not change the answers
+        return self.inner.cache_namespace()
+
+    def _record(self, payload: dict, content: str, finish_reason: Optional[str], usage: Optional[dict]):
+        entry = {
+            'key': LLMResponseCache.make_key(payload),
+            'request': payload,
+            'content': content,
+            'finish_reason': finish_reason,
+            'usage': usage
+        }
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _record_result(self, payload: dict, result: BackendResult):
+        if result.status_code == 200 and result.data.get('choices'):
+            choice = result.data['choices'][0]
+            self._record(payload, choice['message']['content'], choice.get('finish_reason'), result.data.get('usage'))
+
+    def complete(self, payload: dict) -> BackendResult:
+        result = self.inner.complete(payload)
+        self._record_result(payload, result)
+        return result
+
+    async def acomplete(self, payload: dict) -> BackendResult:
+        result = await self.inner.acomplete(payload)
+        self._record_result(payload, result)
+        return result
+
+    @asynccontextmanager
+    async def astream(self, payload: dict):
+        async with self.inner.astream(payload) as stream:
+            if stream.status_code != 200:
+                yield stream
+                return
+
+            parts: List[str] = []
+            state = {'finish_reason': None, 'usage': None, 'done': False}
+
+            async def recorded_events():
+                async for event in stream.events:
+                    state['usage'] = event.get('usage') or event.get('x_groq', {}).get('usage') or state['usage']
+                    if event.get('choices'):
+                        choice = event['choices'][0]
+                        state['finish_reason'] = choice.get('finish_reason') or state['finish_reason']
+                        parts.append(choice.get('delta', {}).get('content') or '')
+                    yield event
+                state['done'] = True
+
+            yield BackendStream(stream.status_code, stream.headers, recorded_events())
+            if state['done']:
+                self._record(payload, ''.join(parts), state['finish_reason'], state['usage'])
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+class ReplayBackend(LLMBackend):
+    """Answers from a recording made by RecordingBackend; unknown requests get a 404"""
+
+    name = 'replay'
+
+    def __init__(self, path: str = LLM_RECORDING_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+        logger.info(f"▶️  Replaying {len(self.entries)} recorded LLM calls from {self.path}")
+
+    def _lookup(self, payload: dict) -> Optional[dict]:
+        # Recordings are keyed without the stream flag so both call styles can replay them
+        return self.entries.get(LLMResponseCache.make_key({k: v for k, v in payload.items() if k != 'stream'}))
+
+    def complete(self, payload: dict) -> BackendResult:
+        entry = self._lookup(payload)
+        if entry is None:
+            return BackendResult(404, data={'error': {'message': 'request not found in recording'}})
+        return BackendResult(200, data=_content_result(entry['content'], entry.get('finish_reason'), entry.get('usage')))
+
+    async def acomplete(self, payload: dict) -> BackendResult:
+        return self.complete(payload)
+
+    @asynccontextmanager
+    async def astream(self, payload: dict):
+        entry = self._lookup(payload)
+
+        async def replayed_events():
+            if entry is None:
+                return
+            yield {'choices': [{'delta': {'content': entry['content']}, 'finish_reason': entry.get('finish_reason')}],
+                   'usage': entry.get('usage')}
+
+        yield BackendStream(200 if entry else 404, {}, replayed_events())
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    """groq | local | record | replay (record wraps LLM_RECORD_TARGET)"""
+    if name == 'groq':
+        return GroqBackend()
+    if name == 'local':
+        return LocalBackend()
+    if name == 'record':
+        return RecordingBackend(create_backend(LLM_RECORD_TARGET))
+    if name == 'replay':
+        return ReplayBackend()
+    raise ValueError(f"❌ Unknown LLM backend: {name}")
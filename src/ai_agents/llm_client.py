@@ -1,65 +1,245 @@
 import logging
-import requests
-import json
-from typing import Optional
+import time
+import asyncio
+from typing import Optional, Tuple, Dict, Any, AsyncIterator
 import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-from config import GROQ_API_KEY, GROQ_MODEL
+from config import GROQ_MODEL, LLM_MAX_RETRIES, LLM_CACHE_ENABLED
+from .llm_backends import LLMBackend, BackendResult, BackendConnectionError, create_backend
+from .rate_limiter import RateLimiter
+from .response_cache import LLMResponseCache
+from .token_budget import TokenEstimator
 
 logger = logging.getLogger(__name__)
 
 class LLMClient:
-    def __init__(self):
-        self.api_key = GROQ_API_KEY
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, cache: Optional[LLMResponseCache] = None,
+                 backend: Optional[LLMBackend] = None):
         self.model = GROQ_MODEL
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        if not self.api_key or self.api_key == 'YOUR_GROQ_API_KEY_HERE':
-            raise ValueError("❌ GROQ_API_KEY not set! Get free key from: https://console.groq.com/keys")
-        
-        logger.info(f"✅ Groq LLM Client initialized with model: {self.model}")
-    
-    def generate(self, prompt: str, max_tokens: int = 1000) -> str:
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert at analyzing app reviews and extracting topics. Always respond with valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.1,
-                "max_tokens": max_tokens,
-                "top_p": 0.9
-            }
-            
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result['choices'][0]['message']['content'].strip()
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Groq API error: {e}")
-            return ""
-        except Exception as e:
-            logger.error(f"❌ Error generating response: {e}")
+        self.backend = backend or create_backend()
+
+        self.system_prompt = "You are an expert at analyzing app reviews and extracting topics. Always respond with valid JSON."
+        self.tokens = TokenEstimator()
+
+        # One limiter per client so every thread/task draws from the same quota
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+        # Identical prompts are answered from disk instead of the API
+        self.cache = cache if cache is not None else (LLMResponseCache() if LLM_CACHE_ENABLED else None)
+
+        logger.info(f"✅ LLM Client initialized with model: {self.model} ({self.backend.name} backend)")
+
+    def _build_payload(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt or self.system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+            "top_p": 0.9
+        }
+
+    def _estimate_tokens(self, payload: dict) -> int:
+        """Prompt tokens plus the completion we asked for"""
+        prompt_tokens = sum(self.tokens.count(m['content']) for m in payload['messages'])
+        return prompt_tokens + payload['max_tokens']
+
+    @staticmethod
+    def _is_retryable(status_code: int) -> bool:
+        return status_code == 429 or status_code >= 500
+
+    @staticmethod
+    def _used_tokens(result: dict) -> Optional[int]:
+        return (result.get('usage') or {}).get('total_tokens')
+
+    def _handle_result(self, result: BackendResult, reserved: int, cache_key: Optional[str]) -> str:
+        if result.status_code >= 400:
+            logger.error(f"❌ LLM API error {result.status_code}: {result.data.get('error', result.data)}")
+            # A rejected request consumed no completion tokens
+            self.rate_limiter.settle(reserved, 0)
             return ""
 
+        self.rate_limiter.settle(reserved, self._used_tokens(result.data))
+        choice = result.data['choices'][0]
+        content = choice['message']['content'].strip()
+        if choice.get('finish_reason') != 'length':
+            self._cache_store(cache_key, content)
+        return content
+
+    def _cache_lookup(self, payload: dict) -> Tuple[Optional[str], Optional[str]]:
+        if self.cache is None:
+            return None, None
+        # Keyed per backend so mock (local) or replayed answers are never served to a real run
+        key = LLMResponseCache.make_key(payload, self.backend.cache_namespace())
+        return key, self.cache.get(key)
+
+    def _cache_store(self, key: Optional[str], content: str):
+        if self.cache is not None and key is not None:
+            self.cache.put(key, content, self.model)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def generate(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None) -> str:
+        payload = self._build_payload(prompt, max_tokens, system_prompt)
+        cache_key, cached = self._cache_lookup(payload)
+        if cached is not None:
+            return cached
+
+        reserved = self._estimate_tokens(payload)
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.rate_limiter.acquire(reserved)
+            try:
+                result = self.backend.complete(payload)
+                self.rate_limiter.update_from_headers(result.headers)
+
+                if self._is_retryable(result.status_code) and attempt < LLM_MAX_RETRIES:
+                    # Each attempt reserves again, so release this one before backing off
+                    self.rate_limiter.settle(reserved, 0)
+                    delay = self.rate_limiter.backoff_delay(attempt, result.headers.get('retry-after'))
+                    logger.warning(f"⚠️  LLM API returned {result.status_code}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+
+                return self._handle_result(result, reserved, cache_key)
+
+            except BackendConnectionError as e:
+                self.rate_limiter.settle(reserved, 0)
+                if attempt == LLM_MAX_RETRIES:
+                    break
+                delay = self.rate_limiter.backoff_delay(attempt)
+                logger.warning(f"⚠️  LLM API connection error: {e}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception as e:
+                logger.error(f"❌ Error generating response: {e}")
+                return ""
+
+        logger.error(f"❌ LLM API still failing after {LLM_MAX_RETRIES} retries")
+        return ""
+
+    async def agenerate(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None) -> str:
+        """Async variant of generate(); the backend shares one pooled keep-alive client"""
+        payload = self._build_payload(prompt, max_tokens, system_prompt)
+        cache_key, cached = self._cache_lookup(payload)
+        if cached is not None:
+            return cached
+
+        reserved = self._estimate_tokens(payload)
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self.rate_limiter.aacquire(reserved)
+            try:
+                result = await self.backend.acomplete(payload)
+                self.rate_limiter.update_from_headers(result.headers)
+
+                if self._is_retryable(result.status_code) and attempt < LLM_MAX_RETRIES:
+                    # Each attempt reserves again, so release this one before backing off
+                    self.rate_limiter.settle(reserved, 0)
+                    delay = self.rate_limiter.backoff_delay(attempt, result.headers.get('retry-after'))
+                    logger.warning(f"⚠️  LLM API returned {result.status_code}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                return self._handle_result(result, reserved, cache_key)
+
+            except BackendConnectionError as e:
+                self.rate_limiter.settle(reserved, 0)
+                if attempt == LLM_MAX_RETRIES:
+                    break
+                delay = self.rate_limiter.backoff_delay(attempt)
+                logger.warning(f"⚠️  LLM API connection error: {e}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logger.error(f"❌ Error generating response: {e}")
+                return ""
+
+        logger.error(f"❌ LLM API still failing after {LLM_MAX_RETRIES} retries")
+        return ""
+
+    async def astream(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield completion text as it is generated (SSE); retries only before the first token"""
+        payload = self._build_payload(prompt, max_tokens, system_prompt)
+        cache_key, cached = self._cache_lookup(payload)
+        if cached is not None:
+            yield cached
+            return
+
+        reserved = self._estimate_tokens(payload)
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self.rate_limiter.aacquire(reserved)
+            parts = []
+            usage = None
+            finish_reason = None
+            retry_delay = None
+            try:
+                async with self.backend.astream(payload) as stream:
+                    self.rate_limiter.update_from_headers(stream.headers)
+
+                    if self._is_retryable(stream.status_code) and attempt < LLM_MAX_RETRIES:
+                        self.rate_limiter.settle(reserved, 0)
+                        retry_delay = self.rate_limiter.backoff_delay(attempt, stream.headers.get('retry-after'))
+                        logger.warning(f"⚠️  LLM API returned {stream.status_code}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {retry_delay:.1f}s")
+                    elif stream.status_code >= 400:
+                        logger.error(f"❌ LLM API error {stream.status_code}")
+                        self.rate_limiter.settle(reserved, 0)
+                        return
+                    else:
+                        async for event in stream.events:
+                            usage = event.get('usage') or event.get('x_groq', {}).get('usage') or usage
+                            if not event.get('choices'):
+                                continue
+                            finish_reason = event['choices'][0].get('finish_reason') or finish_reason
+                            delta = event['choices'][0].get('delta', {}).get('content')
+                            if delta:
+                                parts.append(delta)
+                                yield delta
+
+                if retry_delay is not None:
+                    await asyncio.sleep(retry_delay)
+                    continue
+
+                self.rate_limiter.settle(reserved, (usage or {}).get('total_tokens'))
+                # Truncated completions are salvaged by the caller but not worth replaying
+                if finish_reason != 'length':
+                    self._cache_store(cache_key, ''.join(parts).strip())
+                return
+
+            except BackendConnectionError as e:
+                if parts:
+                    # Text already went to the caller; a retry would duplicate it
+                    logger.error(f"❌ LLM stream broke after {len(parts)} chunks: {e}")
+                    return
+                # Nothing was generated for this attempt's reservation
+                self.rate_limiter.settle(reserved, 0)
+                if attempt == LLM_MAX_RETRIES:
+                    break
+                delay = self.rate_limiter.backoff_delay(attempt)
+                logger.warning(f"⚠️  LLM API connection error: {e}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logger.error(f"❌ Error streaming response: {e}")
+                return
+
+        logger.error(f"❌ LLM API still failing after {LLM_MAX_RETRIES} retries")
+
+    async def aclose(self):
+        """Release loop-bound backend resources; must run on the loop that used them"""
+        await self.backend.aclose()
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     client = LLMClient()
     test_response = client.generate("Extract topics from: 'Delivery was late and food was cold'")
-    print(f"Test Response: {test_response}")
\ No newline at end of file
+    print(f"Test Response: {test_response}")
@@ -0,0 +1,222 @@
+"""
+Local OpenAI-compatible stand-in for the Groq chat-completions API.
+
+Answers topic-extraction prompts with keyword-based topics so Phase 2 can be
+run and benchmarked offline. Latency, 5xx errors and 429s are configurable:
+
+    python src/ai_agents/mock_llm_server.py --port 8008 --latency 0.8 --rpm 60 --rate-limit-rate 0.05
+    LLM_BACKEND=local python src/main_phase2.py
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+_REVIEW_LINE = re.compile(r'^(r\d+) \((\d)★\): (.*)$', re.MULTILINE)
+
+# (keywords, topic, category) checked in order; first matches win
+KEYWORD_TOPICS = [
+    (('late', 'delay', 'deliver', 'waiting', 'hour'), 'Delivery issue', 'issue'),
+    (('cold', 'stale', 'taste', 'quality', 'spoil', 'raw', 'quantity'), 'Food quality issue', 'issue'),
+    (('rude', 'partner', 'boy', 'behav', 'misbehav', 'rider'), 'Delivery partner behavior', 'issue'),
+    (('crash', 'bug', 'login', 'otp', 'error', 'payment', 'slow', 'hang'), 'App technical issue', 'issue'),
+    (('refund', 'money', 'charge', 'fee', 'price', 'expensive'), 'Refund and pricing issue', 'issue'),
+    (('customer care', 'support', 'complaint', 'chat'), 'Customer support issue', 'issue'),
+    (('please add', 'feature', 'option', 'should have', 'wish'), 'Feature request', 'request'),
+    (('24/7', 'night', 'open', 'timing', 'midnight'), 'Service timing request', 'request'),
+]
+
+def topics_for_text(text: str) -> List[tuple]:
+    text = text.lower()
+    matches = [(topic, category) for keywords, topic, category in KEYWORD_TOPICS
+               if any(keyword in text for keyword in keywords)]
+    return matches or [('General feedback', 'feedback')]
+
+def build_completion_text(messages: List[Dict[str, str]]) -> str:
+    """Fake {"topics": [...]} answer grouping review handles by keyword topic"""
+    prompt = messages[-1]['content'] if messages else ''
+    topics: Dict[str, Dict[str, Any]] = {}
+
+    reviews = _REVIEW_LINE.findall(prompt)
+    if reviews:
+        for handle, _, text in reviews:
+            for topic, category in topics_for_text(text):
+                entry = topics.setdefault(topic, {'topic_name': topic, 'category': category, 'review_ids': [], 'is_new': False})
+                entry['review_ids'].append(handle)
+    else:
+        for topic, category in topics_for_text(prompt):
+            topics[topic] = {'topic_name': topic, 'category': category, 'review_ids': [], 'is_new': False}
+
+    return json.dumps({'topics': list(topics.values())}, ensure_ascii=False)
+
+class MockServerState:
+    """Server-side requests-per-minute window plus fault injection settings"""
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.served = 0
+        self.rejected = 0
+
+    def admit(self) -> tuple:
+        """Returns (allowed, remaining, reset_seconds)"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.window_requests = 0
+            reset = 60 - (now - self.window_start)
+
+            if self.args.rpm and self.window_requests >= self.args.rpm:
+                self.rejected += 1
+                return False, 0, reset
+            if random.random() < self.args.rate_limit_rate:
+                self.rejected += 1
+                return False, max(self.args.rpm - self.window_requests, 0), reset
+
+            self.window_requests += 1
+            self.served += 1
+            remaining = self.args.rpm - self.window_requests if self.args.rpm else 1000000
+            return True, remaining, reset
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state: MockServerState = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, body: dict, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON body'}})
+            return
+
+        args = self.state.args
+        allowed, remaining, reset = self.state.admit()
+        limit_headers = {
+            'x-ratelimit-remaining-requests': str(remaining),
+            'x-ratelimit-reset-requests': f'{reset:.2f}s'
+        }
+        if not allowed:
+            retry_after = f'{random.uniform(0.5, 1.5) * args.retry_after:.2f}'
+            self._send_json(429, {'error': {'message': 'rate limit exceeded (mock)'}},
+                            dict(limit_headers, **{'retry-after': retry_after}))
+            return
+
+        if random.random() < args.error_rate:
+            time.sleep(self._latency() / 2)
+            self._send_json(500, {'error': {'message': 'injected server error (mock)'}}, limit_headers)
+            return
+
+        content = build_completion_text(payload.get('messages', []))
+        prompt_chars = sum(len(m.get('content', '')) for m in payload.get('messages', []))
+        usage = {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': (prompt_chars + len(content)) // 4
+        }
+
+        if payload.get('stream'):
+            self._stream(content, usage, limit_headers, payload.get('model'))
+        else:
+            time.sleep(self._latency())
+            self._send_json(200, {
+                'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+                'object': 'chat.completion',
+                'model': payload.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage
+            }, limit_headers)
+
+    def _latency(self) -> float:
+        args = self.state.args
+        return max(0.0, random.gauss(args.latency, args.jitter))
+
+    def _stream(self, content: str, usage: dict, headers: Dict[str, str], model: str):
+        total = self._latency()
+        pieces = [content[i:i + 12] for i in range(0, len(content), 12)] or ['']
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        # Time to first token, then the rest spread across the pieces
+        time.sleep(total * 0.3)
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            event = {
+                'object': 'chat.completion.chunk',
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': 'stop' if last else None}]
+            }
+            if last:
+                event['x_groq'] = {'usage': usage}
+            self.wfile.write(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(total * 0.7 / len(pieces))
+
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+def run_server(args):
+    MockLLMHandler.state = MockServerState(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockLLMHandler)
+    server.daemon_threads = True
+    print(f"🧪 Mock LLM server on http://{args.host}:{args.port}/v1/chat/completions "
+          f"(latency={args.latency}s, error_rate={args.error_rate}, 429_rate={args.rate_limit_rate}, rpm={args.rpm or '∞'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state = MockLLMHandler.state
+        print(f"\nServed {state.served} requests, rejected {state.rejected} with 429")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible mock LLM server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--latency', type=float, default=0.8, help='mean seconds per completion')
+    parser.add_argument('--jitter', type=float, default=0.2, help='stddev of latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--rpm', type=int, default=0, help='server-side requests per minute (0 = unlimited)')
+    parser.add_argument('--retry-after', type=float, default=2.0, help='mean retry-after seconds on 429')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_server(parse_args())
@@ -0,0 +1,148 @@
+import logging
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Mapping, Optional
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import (
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+    LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse '7.66s', '2m59.56s', '120ms' or plain seconds into seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+
+    scale = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """Per-minute bucket; reservations may go negative and return the wait needed"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def clamp(self, remaining: float, now: float):
+        """Trust the provider when it reports less headroom than we think we have"""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+class RateLimiter:
+    """Request- and token-per-minute limiter shared by all threads/tasks of one LLMClient"""
+
+    def __init__(self,
+                 requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = LLM_BACKOFF_MAX_SECONDS):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.request_bucket.reserve(1, now),
+                self.token_bucket.reserve(tokens, now),
+                self.paused_until - now
+            )
+            return max(wait, 0.0)
+
+    def acquire(self, tokens: int):
+        """Block the calling thread until the request fits in both buckets"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int):
+        """Async variant of acquire() that yields to other tasks while waiting"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved_tokens: int, used_tokens: Optional[int]):
+        """Return unused token reservation once the real usage is known"""
+        if used_tokens is None or used_tokens >= reserved_tokens:
+            return
+        with self._lock:
+            self.token_bucket.refund(reserved_tokens - used_tokens, time.monotonic())
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adapt bucket levels to the provider's x-ratelimit-* headers"""
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+
+            remaining_requests = headers.get('x-ratelimit-remaining-requests')
+            if remaining_requests is not None:
+                try:
+                    self.request_bucket.clamp(float(remaining_requests), now)
+                except ValueError:
+                    pass
+
+            remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+            if remaining_tokens is not None:
+                try:
+                    self.token_bucket.clamp(float(remaining_tokens), now)
+                except ValueError:
+                    pass
+
+                # Out of tokens: hold everyone until the provider's token window resets
+                reset_tokens = parse_duration(headers.get('x-ratelimit-reset-tokens'))
+                if reset_tokens and self.token_bucket.tokens <= 0:
+                    self.paused_until = max(self.paused_until, now + reset_tokens)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with full jitter, never shorter than retry-after"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+        server_delay = parse_duration(retry_after)
+        if server_delay is not None:
+            delay = max(delay, server_delay + random.uniform(0, self.backoff_base))
+            with self._lock:
+                # A 429 applies to every caller sharing this quota, not just this one
+                self.paused_until = max(self.paused_until, time.monotonic() + server_delay)
+
+        return delay
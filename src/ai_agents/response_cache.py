@@ -0,0 +1,136 @@
+import logging
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import LLM_CACHE_PATH, LLM_CACHE_TTL_DAYS, LLM_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """Content-addressed SQLite cache of LLM completions with TTL and size eviction"""
+
+    def __init__(self, db_path: str = LLM_CACHE_PATH, ttl_days: float = LLM_CACHE_TTL_DAYS,
+                 max_mb: float = LLM_CACHE_MAX_MB):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_last_access ON llm_responses(last_access)')
+        self.conn.commit()
+
+        self._purge_expired()
+        self._total_bytes = self.conn.execute(
+            'SELECT COALESCE(SUM(size_bytes), 0) FROM llm_responses'
+        ).fetchone()[0]
+
+        logger.info(f"✅ LLM response cache ready at {self.db_path}")
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any], backend: Optional[str] = None) -> str:
+        """
+        Hash of everything that determines the completion: model, messages,
+        sampling params and, when given, the backend that answers it.
+        """
+        request = payload if backend is None else {'backend': backend, 'payload': payload}
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT response, created_at FROM llm_responses WHERE cache_key = ?', (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self.conn.execute('UPDATE llm_responses SET last_access = ? WHERE cache_key = ?', (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, model: str = None):
+        if not response:
+            return
+
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            previous = self.conn.execute(
+                'SELECT size_bytes FROM llm_responses WHERE cache_key = ?', (key,)
+            ).fetchone()
+            self.conn.execute('''
+                INSERT OR REPLACE INTO llm_responses
+                (cache_key, model, response, size_bytes, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, model, response, size, now, now))
+            self._total_bytes += size - (previous[0] if previous else 0)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict_lru()
+            self.conn.commit()
+
+    def _evict_lru(self):
+        """Drop least recently used entries until the cache is back under 90% of its limit"""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = self.conn.execute('SELECT cache_key, size_bytes FROM llm_responses ORDER BY last_access').fetchall()
+        victims = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+            evicted += 1
+
+        self.conn.executemany('DELETE FROM llm_responses WHERE cache_key = ?', victims)
+        logger.info(f"🧹 Evicted {evicted} LLM cache entries")
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            deleted = self.conn.execute('DELETE FROM llm_responses WHERE created_at < ?', (cutoff,)).rowcount
+            self.conn.commit()
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} expired LLM cache entries")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM llm_responses').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'size_mb': round(self._total_bytes / (1024 * 1024), 2)
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,57 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+from sklearn.cluster import AgglomerativeClustering
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import CLUSTER_DISTANCE_THRESHOLD, CLUSTER_MIN_SIZE, CLUSTER_REPRESENTATIVES
+
+logger = logging.getLogger(__name__)
+
+class ReviewClusterer:
+    """
+    Groups reviews by embedding so the LLM names each cluster once from a few
+    representatives instead of reading every review.
+    """
+
+    def __init__(self, vector_store, distance_threshold: float = CLUSTER_DISTANCE_THRESHOLD,
+                 min_cluster_size: int = CLUSTER_MIN_SIZE, representatives: int = CLUSTER_REPRESENTATIVES):
+        self.vector_store = vector_store
+        self.distance_threshold = distance_threshold
+        self.min_cluster_size = min_cluster_size
+        self.representatives = representatives
+
+    def cluster(self, reviews_df: pd.DataFrame) -> Tuple[List[Tuple[pd.DataFrame, pd.DataFrame]], pd.DataFrame]:
+        """Returns ([(members_df, representatives_df)], reviews in clusters too small to name)"""
+        if len(reviews_df) < self.min_cluster_size:
+            return [], reviews_df
+
+        embeddings = self.vector_store.encode(reviews_df['content'].astype(str).tolist())
+
+        # Average-linkage cosine distance keeps clusters tight without fixing their number
+        labels = AgglomerativeClustering(
+            n_clusters=None,
+            metric='cosine',
+            linkage='average',
+            distance_threshold=self.distance_threshold
+        ).fit_predict(embeddings)
+
+        clusters = []
+        small = np.zeros(len(reviews_df), dtype=bool)
+        for label in np.unique(labels):
+            positions = np.flatnonzero(labels == label)
+            if len(positions) < self.min_cluster_size:
+                small[positions] = True
+                continue
+
+            centroid = embeddings[positions].mean(axis=0)
+            closest = positions[np.argsort(-(embeddings[positions] @ centroid))[:self.representatives]]
+            clusters.append((reviews_df.iloc[positions], reviews_df.iloc[closest]))
+
+        clusters.sort(key=lambda cluster: -len(cluster[0]))
+        logger.info(f"  🧩 Clustered {len(reviews_df)} reviews into {len(clusters)} clusters, "
+                    f"{int(small.sum())} reviews left unclustered")
+        return clusters, reviews_df[small]
@@ -0,0 +1,99 @@
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+import pandas as pd
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import TRIVIAL_REVIEW_MIN_INFO_WORDS, DEDUP_MEMORY_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Words that carry sentiment but no topic ("good app", "very nice", "worst")
+GENERIC_REVIEW_WORDS = {
+    'a', 'an', 'the', 'is', 'it', 'its', 'this', 'app', 'application', 'swiggy', 'very', 'so', 'too',
+    'really', 'much', 'and', 'i', 'me', 'my', 'am', 'was', 'be', 'of', 'for', 'to', 'in',
+    'good', 'nice', 'best', 'great', 'super', 'awesome', 'excellent', 'amazing', 'love', 'like',
+    'ok', 'okay', 'fine', 'cool', 'wow', 'thanks', 'thank', 'you', 'u', 'superb', 'perfect',
+    'bad', 'worst', 'poor', 'useless', 'pathetic', 'waste', 'hate', 'terrible', 'horrible',
+    'service', 'experience', 'overall', 'nyc', 'gud', 'v', 'vry', 'nic'
+}
+
+_NON_WORD = re.compile(r'[^\w\s]|_', re.UNICODE)
+_WHITESPACE = re.compile(r'\s+')
+_REPEATED_CHAR = re.compile(r'(\w)\1{2,}')
+
+def normalize_review_text(text: Any) -> str:
+    """Lowercase, drop punctuation/emoji and squash repeats so 'Good!!' == 'goood'"""
+    if not isinstance(text, str):
+        return ''
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _NON_WORD.sub(' ', text)
+    text = _REPEATED_CHAR.sub(r'\1\1', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+class ReviewDeduplicator:
+    """Collapses identical and near-duplicate reviews and filters out ones too short to carry a topic"""
+
+    def __init__(self, min_info_words: int = TRIVIAL_REVIEW_MIN_INFO_WORDS, memory_size: int = DEDUP_MEMORY_SIZE):
+        self.min_info_words = min_info_words
+        self.memory_size = memory_size
+        # normalized text -> [(topic_name, category, is_new)] from earlier batches
+        self._memory: "OrderedDict[str, List[Tuple[str, str, bool]]]" = OrderedDict()
+
+    def is_trivial(self, normalized: str) -> bool:
+        info_words = {w for w in normalized.split() if w not in GENERIC_REVIEW_WORDS and not w.isdigit()}
+        return len(info_words) < self.min_info_words
+
+    def plan(self, reviews_df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Split a batch into: trivial rows, rows answered from memory, and one
+        representative row per distinct text (with its duplicate members).
+        Rows carrying a near_dup_group (from the MinHash index) are grouped by
+        it instead of by text, across batches as well as within one.
+        """
+        trivial, recalled, members = [], [], {}
+        representatives = OrderedDict()
+
+        for idx, row in reviews_df.iterrows():
+            review_id = row.get('review_id', f'review_{idx}')
+            normalized = normalize_review_text(row['content'])
+            group = row.get('near_dup_group')
+            key = f'near:{group}' if isinstance(group, str) and group else normalized
+
+            if self.is_trivial(normalized):
+                trivial.append((review_id, row))
+            elif key in self._memory:
+                self._memory.move_to_end(key)
+                recalled.append((review_id, row, self._memory[key]))
+            elif key in representatives:
+                members[representatives[key]].append((review_id, row))
+            else:
+                representatives[key] = review_id
+                members[review_id] = []
+
+        rep_ids = set(representatives.values())
+        id_series = pd.Series(
+            [row.get('review_id', f'review_{idx}') for idx, row in reviews_df.iterrows()],
+            index=reviews_df.index
+        )
+        llm_df = reviews_df[id_series.isin(rep_ids)]
+
+        return {
+            'llm_df': llm_df,
+            'members': members,
+            'keys': {review_id: key for key, review_id in representatives.items()},
+            'trivial': trivial,
+            'recalled': recalled
+        }
+
+    def remember(self, key: str, topics: List[Dict[str, Any]]):
+        if not topics:
+            return
+        self._memory[key] = [(t['topic_name'], t['topic_category'], t['is_new_topic']) for t in topics]
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
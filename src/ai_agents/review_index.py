@@ -0,0 +1,175 @@
+import logging
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import (
+    DB_PATH, REVIEW_INDEX_DIR, KNN_K, KNN_MIN_SIMILARITY, KNN_MIN_AGREEMENT, KNN_MIN_INDEX_SIZE
+)
+from data_collection.sqlite_manager import get_connection_manager
+
+logger = logging.getLogger(__name__)
+
+class LabeledReviewIndex:
+    """
+    Embeddings of already-labeled reviews (raw_reviews joined to processed_topics),
+    persisted as a float16 .npy matrix plus a JSON label file. New reviews whose
+    nearest labeled neighbours agree inherit their topics without an LLM call.
+
+    Only labels the LLM assigned are indexed; propagated, recalled and trivial
+    labels would otherwise feed back into the neighbours they came from.
+    """
+
+    name = 'knn'
+    indexed_sources = ('llm', 'cluster')
+
+    def __init__(self, vector_store, db_path: str = DB_PATH, index_dir: str = REVIEW_INDEX_DIR,
+                 k: int = KNN_K, min_similarity: float = KNN_MIN_SIMILARITY,
+                 min_agreement: float = KNN_MIN_AGREEMENT, min_index_size: int = KNN_MIN_INDEX_SIZE):
+        self.vector_store = vector_store
+        self.db_path = db_path
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_file = self.index_dir / 'review_vectors.npy'
+        self.labels_file = self.index_dir / 'review_labels.json'
+
+        self.k = k
+        self.min_similarity = min_similarity
+        self.min_agreement = min_agreement
+        self.min_index_size = min_index_size
+
+        self.review_ids: List[str] = []
+        self.labels: List[List[Tuple[str, str]]] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float16)
+        self._positions: Dict[str, int] = {}
+
+        self._load()
+        logger.info(f"✅ Labeled review index ready with {len(self.review_ids)} reviews")
+
+    def _load(self):
+        if not (self.vectors_file.exists() and self.labels_file.exists()):
+            return
+        try:
+            with open(self.labels_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            vectors = np.load(self.vectors_file)
+            if len(vectors) != len(meta['review_ids']):
+                logger.warning("⚠️  Review index files out of sync, rebuilding from database")
+                return
+            self.vectors = vectors
+            self.review_ids = meta['review_ids']
+            self.labels = [[tuple(label) for label in labels] for labels in meta['labels']]
+            self._positions = {review_id: i for i, review_id in enumerate(self.review_ids)}
+        except Exception as e:
+            logger.error(f"❌ Could not load review index, rebuilding: {e}")
+
+    def save(self):
+        # Labels are written last so a crash leaves a detectable size mismatch, not silent drift
+        np.save(self.vectors_file, self.vectors)
+        with open(self.labels_file, 'w', encoding='utf-8') as f:
+            json.dump({'review_ids': self.review_ids, 'labels': self.labels}, f, ensure_ascii=False)
+
+    def refresh(self):
+        """Sync with processed_topics: encode newly labeled reviews, reload labels of known ones"""
+        conn = get_connection_manager(self.db_path).connection()
+        try:
+            # Mentions stored before label_source existed cannot be told apart and are kept
+            df = pd.read_sql_query(f'''
+                SELECT r.review_id, r.content, p.topic_name, p.topic_category
+                FROM raw_reviews r
+                JOIN processed_topics p ON p.review_id = r.review_id
+                WHERE p.label_source IS NULL OR p.label_source IN ({','.join('?' * len(self.indexed_sources))})
+            ''', conn, params=list(self.indexed_sources))
+        except Exception as e:
+            logger.warning(f"⚠️  Review index refresh skipped: {e}")
+            return
+
+        if df.empty:
+            return
+
+        labels = {
+            review_id: sorted(set(zip(group['topic_name'], group['topic_category'].fillna('issue'))))
+            for review_id, group in df.groupby('review_id')
+        }
+        contents = df.drop_duplicates('review_id').set_index('review_id')['content']
+        self._upsert(labels, contents)
+        self.save()
+
+    def add_labeled(self, reviews_df: pd.DataFrame, topics: List[Dict[str, Any]]):
+        """Add a freshly processed batch so later days can already propagate from it"""
+        if reviews_df.empty or not topics:
+            return
+        labels: Dict[str, set] = {}
+        for topic in topics:
+            if topic.get('label_source', 'llm') not in self.indexed_sources:
+                continue
+            labels.setdefault(topic['review_id'], set()).add((topic['topic_name'], topic.get('topic_category', 'issue')))
+        if not labels:
+            return
+        contents = reviews_df.set_index('review_id')['content']
+        self._upsert({review_id: sorted(pairs) for review_id, pairs in labels.items()}, contents)
+
+    def _upsert(self, labels: Dict[str, List[Tuple[str, str]]], contents: pd.Series):
+        new_ids = []
+        for review_id, review_labels in labels.items():
+            position = self._positions.get(review_id)
+            if position is not None:
+                self.labels[position] = review_labels
+            elif review_id in contents.index:
+                new_ids.append(review_id)
+
+        if not new_ids:
+            return
+
+        logger.info(f"Encoding {len(new_ids)} newly labeled reviews for the kNN index")
+        texts = [str(contents.loc[review_id]) for review_id in new_ids]
+        new_vectors = self.vector_store.encode_many(texts).astype(np.float16)
+
+        self.vectors = new_vectors if self.vectors.size == 0 else np.vstack([self.vectors, new_vectors])
+        for review_id in new_ids:
+            self._positions[review_id] = len(self.review_ids)
+            self.review_ids.append(review_id)
+            self.labels.append(labels[review_id])
+
+    def label(self, reviews_df: pd.DataFrame) -> Tuple[Dict[str, List[Tuple[str, str]]], pd.DataFrame]:
+        """Returns ({review_id: [(topic_name, category)]}, reviews left for later stages)"""
+        if reviews_df.empty or len(self.review_ids) < self.min_index_size:
+            return {}, reviews_df
+
+        review_ids = [row.get('review_id', f'review_{idx}') for idx, row in reviews_df.iterrows()]
+        queries = self.vector_store.encode(reviews_df['content'].astype(str).tolist())
+
+        k = min(self.k, len(self.review_ids))
+        assigned = {}
+        inherited = np.zeros(len(review_ids), dtype=bool)
+
+        index_vectors = self.vectors.astype(np.float32)
+
+        # Blocks keep the similarity matrix small when history grows large
+        block = 256
+        for start in range(0, len(queries), block):
+            similarities = queries[start:start + block] @ index_vectors.T
+            neighbours = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+            for row, neighbour_ids in enumerate(neighbours):
+                neighbour_sims = similarities[row, neighbour_ids]
+                if neighbour_sims.mean() < self.min_similarity:
+                    continue
+
+                votes: Dict[Tuple[str, str], int] = {}
+                for neighbour in neighbour_ids:
+                    for label in self.labels[neighbour]:
+                        votes[label] = votes.get(label, 0) + 1
+
+                agreed = [label for label, count in votes.items() if count / k >= self.min_agreement]
+                if agreed:
+                    i = start + row
+                    assigned[review_ids[i]] = agreed
+                    inherited[i] = True
+
+        return assigned, reviews_df[~inherited]
@@ -0,0 +1,100 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Tuple
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import CASCADE_MIN_SIMILARITY, CASCADE_MARGIN, CASCADE_MAX_WORDS
+
+logger = logging.getLogger(__name__)
+
+SEED_TOPIC_CATEGORIES = {
+    "Delivery issue": "issue",
+    "Food quality issue": "issue",
+    "Delivery partner behavior": "issue",
+    "App technical issue": "issue",
+    "Feature request": "request",
+    "Service timing request": "request"
+}
+
+# Short review-like phrasings; each seed prototype is their normalized mean embedding
+SEED_TOPIC_EXEMPLARS = {
+    "Delivery issue": [
+        "delivery was very late", "order delayed by an hour", "order never delivered",
+        "took too long to deliver", "wrong address delivered", "order not delivered yet"
+    ],
+    "Food quality issue": [
+        "food was cold", "stale food delivered", "food tasted bad", "food quality is poor",
+        "found hair in the food", "quantity was too less"
+    ],
+    "Delivery partner behavior": [
+        "delivery boy was rude", "delivery partner misbehaved", "rider asked for extra money",
+        "delivery guy did not come to the door", "delivery partner was very polite and helpful"
+    ],
+    "App technical issue": [
+        "app keeps crashing", "cannot login to the app", "payment failed but money deducted",
+        "app is very slow", "otp not received", "app shows error while ordering"
+    ],
+    "Feature request": [
+        "please add an option to", "should have a feature for", "add cash on delivery option",
+        "want to schedule orders", "please add dark mode"
+    ],
+    "Service timing request": [
+        "please make it available at night", "should be open 24/7", "restaurants close too early",
+        "need late night delivery", "service not available in the morning"
+    ]
+}
+
+class SeedTopicCascade:
+    """
+    Labels reviews that clearly belong to a single seed topic using sentence
+    embeddings, so only ambiguous reviews are sent to the LLM.
+    """
+
+    name = 'seed_cascade'
+
+    def __init__(self, vector_store, seed_topics: List[str],
+                 min_similarity: float = CASCADE_MIN_SIMILARITY,
+                 margin: float = CASCADE_MARGIN,
+                 max_words: int = CASCADE_MAX_WORDS):
+        self.vector_store = vector_store
+        self.seed_topics = [topic for topic in seed_topics if topic in SEED_TOPIC_EXEMPLARS]
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self.max_words = max_words
+
+        prototypes = []
+        for topic in self.seed_topics:
+            exemplar_embeddings = self.vector_store.encode_topics(SEED_TOPIC_EXEMPLARS[topic])
+            centroid = exemplar_embeddings.mean(axis=0)
+            prototypes.append(centroid / np.linalg.norm(centroid))
+        self.prototypes = np.vstack(prototypes).astype(np.float32)
+
+        logger.info(f"✅ Seed topic cascade ready ({len(self.seed_topics)} prototypes, "
+                    f"min_similarity={min_similarity}, margin={margin})")
+
+    def label(self, reviews_df: pd.DataFrame) -> Tuple[Dict[str, List[Tuple[str, str]]], pd.DataFrame]:
+        """Returns ({review_id: [(topic_name, category)]}, reviews left for the LLM)"""
+        if reviews_df.empty:
+            return {}, reviews_df
+
+        review_ids = [row.get('review_id', f'review_{idx}') for idx, row in reviews_df.iterrows()]
+        texts = reviews_df['content'].astype(str).tolist()
+
+        similarities = self.vector_store.encode(texts) @ self.prototypes.T
+        order = np.argsort(-similarities, axis=1)
+        best = similarities[np.arange(len(texts)), order[:, 0]]
+        runner_up = similarities[np.arange(len(texts)), order[:, 1]] if len(self.seed_topics) > 1 else np.zeros(len(texts))
+
+        # Long reviews usually mention several topics; leave those to the LLM
+        short_enough = np.array([len(text.split()) <= self.max_words for text in texts])
+        confident = (best >= self.min_similarity) & (best - runner_up >= self.margin) & short_enough
+
+        assigned = {}
+        for i in np.flatnonzero(confident):
+            topic = self.seed_topics[order[i, 0]]
+            assigned[review_ids[i]] = [(topic, SEED_TOPIC_CATEGORIES[topic])]
+
+        return assigned, reviews_df[~confident]
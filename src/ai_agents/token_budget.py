@@ -0,0 +1,65 @@
+import logging
+from typing import List, Tuple
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import TOKENIZER_ENCODING
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+class TokenEstimator:
+    """Counts tokens with a local BPE tokenizer, falling back to ~4 chars per token"""
+
+    def __init__(self, encoding_name: str = TOKENIZER_ENCODING):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logger.warning(f"⚠️  Tokenizer '{encoding_name}' unavailable ({e}), using character estimate")
+        else:
+            logger.info("tiktoken not installed, using character-based token estimate")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+def pack_by_budget(item_costs: List[int], token_budget: int, output_base: int, output_per_item: int,
+                   max_output: int, max_items: int) -> List[Tuple[int, int, int]]:
+    """
+    Greedily pack consecutive items into chunks so that input tokens plus the
+    expected completion fit the budget. Returns (start, end, max_tokens) spans.
+    """
+    spans = []
+    start = 0
+    while start < len(item_costs):
+        end = start
+        used = 0
+        while end < len(item_costs) and end - start < max_items:
+            items = end - start + 1
+            expected_output = min(max_output, output_base + output_per_item * items)
+            if end > start and (
+                used + item_costs[end] + expected_output > token_budget
+                or output_base + output_per_item * items > max_output
+            ):
+                break
+            used += item_costs[end]
+            end += 1
+
+        if end - start == 1 and used + output_base + output_per_item > token_budget:
+            logger.warning(f"⚠️  Review {start} alone needs ~{used} tokens, exceeding the chunk budget")
+
+        items = end - start
+        spans.append((start, end, min(max_output, output_base + output_per_item * items)))
+        start = end
+
+    return spans
@@ -1,13 +1,18 @@
 import logging
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional
 from .vector_store import TopicVectorStore
+from .topic_registry import TopicRegistry
 
 logger = logging.getLogger(__name__)
 
 class TopicConsolidationAgent:
-    def __init__(self, vector_store: TopicVectorStore, similarity_threshold: float = 0.8):
+    def __init__(self, vector_store: TopicVectorStore, similarity_threshold: float = 0.8,
+                 registry: Optional[TopicRegistry] = None):
         self.vector_store = vector_store
         self.similarity_threshold = similarity_threshold
+        # Known raw names resolve through the alias table without touching the embedding model
+        self.registry = registry
         logger.info("✅ Topic Consolidation Agent initialized")
     
     def consolidate_topics(self, raw_topics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -17,24 +22,89 @@ class TopicConsolidationAgent:
         
         logger.info(f"Consolidating {len(raw_topics)} raw topics")
         
-        consolidated_topics = []
+        names = list(dict.fromkeys(topic['topic_name'] for topic in raw_topics))
+        canonical_names = {}
+        if self.registry is not None:
+            for name in names:
+                canonical = self.registry.canonical_name(name)
+                if canonical is not None:
+                    canonical_names[name] = canonical
+        unknown = [name for name in names if name not in canonical_names]
+        if unknown:
+            canonical_names.update(self._resolve_names(unknown))
+        if self.registry is not None:
+            self._register(raw_topics, canonical_names)
         
+        consolidated_topics = []
         for topic in raw_topics:
             topic_name = topic['topic_name']
+            canonical_topic = canonical_names[topic_name]
             
-            canonical_topic = self.vector_store.get_canonical_topic(
-                topic_name, 
-                threshold=self.similarity_threshold
-            )
-            
-            if canonical_topic and canonical_topic != topic_name:
+            if canonical_topic != topic_name:
                 consolidated_topic = topic.copy()
                 consolidated_topic['topic_name'] = canonical_topic
                 consolidated_topic['original_topic'] = topic_name
                 consolidated_topics.append(consolidated_topic)
             else:
-                self.vector_store.add_topics([topic_name])
+                consolidated_topic = topic
                 consolidated_topics.append(topic)
+            
+            if self.registry is not None:
+                consolidated_topic['topic_id'] = self.registry.topic_id(canonical_topic)
         
         logger.info(f"✅ Consolidated to {len(consolidated_topics)} topics")
-        return consolidated_topics
\ No newline at end of file
+        return consolidated_topics
+    
+    def _register(self, raw_topics: List[Dict[str, Any]], canonical_names: Dict[str, str]):
+        """Store new canonical topics and raw -> canonical aliases"""
+        topics = {}
+        for topic in raw_topics:
+            canonical = canonical_names[topic['topic_name']]
+            known = topics.get(canonical)
+            # Category comes from a mention that used the canonical spelling, when there is one
+            if known is None or (topic['topic_name'] == canonical and known['name'] != canonical):
+                topics[canonical] = {
+                    'name': topic['topic_name'],
+                    'category': topic.get('topic_category', 'issue'),
+                    'first_seen': topic['date'] if known is None else min(known['first_seen'], topic['date']),
+                    'is_seed': bool(topic.get('is_seed_topic', False))
+                }
+            else:
+                known['first_seen'] = min(known['first_seen'], topic['date'])
+        
+        self.registry.register(
+            canonical_names,
+            [(name, info['category'], info['first_seen'], info['is_seed']) for name, info in topics.items()]
+        )
+    
+    def _resolve_names(self, names: List[str]) -> Dict[str, str]:
+        """
+        Map each distinct name to its canonical topic: one batched encode and
+        store query, then names first seen in this batch are matched in memory
+        against each other, in order, as if they had been added one by one.
+        """
+        embeddings = self.vector_store.encode_topics(names)
+        stored = self.vector_store.get_canonical_topics(names, threshold=self.similarity_threshold, embeddings=embeddings)
+        
+        canonical_names = {}
+        new_names, new_positions = [], []
+        for i, name in enumerate(names):
+            if stored[i]:
+                canonical_names[name] = stored[i]
+                continue
+            
+            if new_positions:
+                # Unit-length embeddings: dot product is the same cosine the store uses
+                similarities = embeddings[new_positions] @ embeddings[i]
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    canonical_names[name] = new_names[best]
+                    continue
+            
+            canonical_names[name] = name
+            new_names.append(name)
+            new_positions.append(i)
+        
+        self.vector_store.add_topics(new_names, embeddings=embeddings[new_positions])
+        logger.info(f"  {len(names)} distinct names: {len(names) - len(new_names)} matched, {len(new_names)} new topics")
+        return canonical_names
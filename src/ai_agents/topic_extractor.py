@@ -1,22 +1,36 @@
 import logging
 import pandas as pd
-from typing import List, Dict, Any
-import re
-import json
+from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime
-import time
+import asyncio
 import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-from config import REVIEWS_PER_API_CALL, API_DELAY_SECONDS
+from config import (
+    LLM_ASYNC_ENABLED, LLM_MAX_CONCURRENCY, LLM_STREAMING_ENABLED,
+    TRIVIAL_REVIEW_TOPIC, TRIVIAL_REVIEW_CATEGORY,
+    MODEL_CONTEXT_WINDOW, CONTEXT_SAFETY_MARGIN, LLM_MAX_OUTPUT_TOKENS,
+    OUTPUT_TOKENS_BASE, OUTPUT_TOKENS_PER_REVIEW, MAX_REVIEWS_PER_CHUNK,
+    EXTRACTION_MAX_RETRIES, EXTRACTION_MODE
+)
 from .llm_client import LLMClient
+from .review_dedup import ReviewDeduplicator
+from .token_budget import TokenEstimator, pack_by_budget
+from .topic_stream_parser import IncrementalTopicParser
 
 logger = logging.getLogger(__name__)
 
 class TopicExtractionAgent:
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, pre_labelers: Optional[List[Any]] = None, clusterer: Optional[Any] = None):
         self.llm = llm_client
+        # Cheap local stages tried in order before the LLM; each has .name and
+        # .label(df) -> ({review_id: [(topic_name, category)]}, remaining_df)
+        self.pre_labelers = pre_labelers or []
+        # Used when EXTRACTION_MODE == 'cluster'; .cluster(df) -> ([(members_df, representatives_df)], leftover_df)
+        self.clusterer = clusterer
+        self.deduplicator = ReviewDeduplicator()
+        self.tokens = TokenEstimator()
         
         self.seed_topics = [
             "Delivery issue",
@@ -27,34 +41,297 @@ class TopicExtractionAgent:
             "Service timing request"
         ]
         
+        self.system_prompt = self._create_system_prompt()
+        self.cluster_system_prompt = self._create_cluster_system_prompt()
+        self.last_batch_stats: Dict[str, Any] = {}
+        
         logger.info("✅ Topic Extraction Agent initialized")
     
     def extract_topics_from_batch(self, reviews_df: pd.DataFrame, batch_date: str) -> List[Dict[str, Any]]:
+        self.last_batch_stats = {}
         if reviews_df.empty:
             return []
         
         logger.info(f"📊 Extracting topics from {len(reviews_df)} reviews for {batch_date}")
         
-        all_topics = []
-        chunk_size = REVIEWS_PER_API_CALL
+        plan = self.deduplicator.plan(reviews_df)
+        llm_df = plan['llm_df']
+        duplicates = sum(len(members) for members in plan['members'].values())
+        logger.info(f"  🔁 Short-circuited {len(reviews_df) - len(llm_df)} reviews "
+                    f"({len(plan['trivial'])} trivial, {len(plan['recalled'])} seen before, {duplicates} duplicates), "
+                    f"{len(llm_df)} left to label")
+        
+        local_topics, local_counts, llm_df = self._apply_pre_labelers(llm_df, batch_date)
+        
+        if EXTRACTION_MODE == 'cluster' and self.clusterer is not None:
+            llm_topics = local_topics + self._extract_by_clusters(llm_df, batch_date)
+        else:
+            llm_topics = local_topics + self._extract_with_coverage(llm_df, batch_date)
+        self.last_batch_stats['short_circuited'] = len(reviews_df) - len(plan['llm_df'])
+        self.last_batch_stats['local_labels'] = local_counts
+        self.last_batch_stats['llm_labels'] = len(llm_df)
+        if self.pre_labelers:
+            logger.info(f"  🏷️  Label split for {batch_date}: "
+                        + ', '.join(f"{name}={count}" for name, count in local_counts.items())
+                        + f", llm={len(llm_df)}")
+        all_topics = self._fan_out_topics(llm_topics, plan, batch_date)
+        
+        logger.info(f"✅ Extracted {len(all_topics)} topic mentions from batch {batch_date}")
+        return all_topics
+    
+    def _apply_pre_labelers(self, reviews_df: pd.DataFrame, batch_date: str) -> Tuple[List[Dict[str, Any]], Dict[str, int], pd.DataFrame]:
+        """Let each local stage label what it is confident about; the rest continues to the LLM"""
+        local_topics = []
+        local_counts = {}
+        remaining = reviews_df
+        
+        for labeler in self.pre_labelers:
+            if remaining.empty:
+                local_counts[labeler.name] = 0
+                continue
+            try:
+                assigned, remaining_after = labeler.label(remaining)
+            except Exception as e:
+                logger.error(f"❌ Pre-labeler {labeler.name} failed, passing reviews on: {e}")
+                local_counts[labeler.name] = 0
+                continue
+            
+            rows = {row.get('review_id', f'review_{idx}'): row for idx, row in remaining.iterrows()}
+            for review_id, topics in assigned.items():
+                for topic_name, category in topics:
+                    local_topics.append(self._make_topic_record(
+                        review_id, rows[review_id], topic_name, category, False, batch_date, source=labeler.name
+                    ))
+            local_counts[labeler.name] = len(assigned)
+            remaining = remaining_after
+        
+        return local_topics, local_counts, remaining
+    
+    def _extract_by_clusters(self, llm_df: pd.DataFrame, batch_date: str) -> List[Dict[str, Any]]:
+        """
+        Name each embedding cluster once from its representatives and give the
+        topics to every member. Unclustered reviews and clusters the model left
+        unnamed go through the regular per-review extraction.
+        """
+        try:
+            clusters, leftovers = self.clusterer.cluster(llm_df)
+        except Exception as e:
+            logger.error(f"❌ Clustering failed, extracting review by review: {e}")
+            return self._extract_with_coverage(llm_df, batch_date)
+        
+        cluster_df = pd.DataFrame([
+            self._cluster_row(f'cluster_{n}', members, representatives)
+            for n, (members, representatives) in enumerate(clusters, 1)
+        ])
+        cluster_topics = self._extract_with_coverage(cluster_df, batch_date, system_prompt=self.cluster_system_prompt)
+        cluster_stats = self.last_batch_stats
+        
+        topics_by_cluster = {}
+        for topic in cluster_topics:
+            topics_by_cluster.setdefault(topic['review_id'], []).append(topic)
+        
+        llm_topics = []
+        named_members = 0
+        unnamed = [leftovers]
+        for n, (members, _) in enumerate(clusters, 1):
+            named = topics_by_cluster.get(f'cluster_{n}')
+            if not named:
+                unnamed.append(members)
+                continue
+            named_members += len(members)
+            for idx, row in members.iterrows():
+                for topic in named:
+                    llm_topics.append(self._make_topic_record(
+                        row.get('review_id', f'review_{idx}'), row, topic['topic_name'],
+                        topic['topic_category'], topic['is_new_topic'], batch_date, source='cluster'
+                    ))
+        
+        llm_topics.extend(self._extract_with_coverage(pd.concat(unnamed), batch_date))
+        
+        # Coverage stays counted in reviews; cluster-level numbers are kept alongside
+        stats = self.last_batch_stats
+        stats['sent'] += named_members
+        stats['covered_first_pass'] += named_members
+        stats['chunks'] += cluster_stats['chunks']
+        stats['failed_chunks'] += cluster_stats['failed_chunks']
+        stats['clusters'] = len(clusters)
+        stats['named_clusters'] = len(topics_by_cluster)
+        logger.info(f"  🧩 Named {len(topics_by_cluster)}/{len(clusters)} clusters covering {named_members} reviews, "
+                    f"{stats['sent'] - named_members} reviews extracted individually")
+        return llm_topics
+    
+    @staticmethod
+    def _cluster_row(cluster_id: str, members: pd.DataFrame, representatives: pd.DataFrame) -> Dict[str, Any]:
+        """One prompt line per cluster: its size and representative texts, in the review row shape"""
+        samples = ' | '.join(' '.join(str(text).split()) for text in representatives['content'])
+        return {
+            'review_id': cluster_id,
+            'content': f"[{len(members)} reviews] {samples}",
+            'score': round(members['score'].mean()),
+            'date': members['date'].iloc[0]
+        }
+    
+    def _extract_with_coverage(self, llm_df: pd.DataFrame, batch_date: str, system_prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Run the LLM over llm_df, then re-queue reviews that got no topic (failed
+        chunk or skipped by the model) into fresh mixed chunks, up to
+        EXTRACTION_MAX_RETRIES rounds. Coverage stats land in last_batch_stats.
+        """
+        stats = {
+            'sent': len(llm_df),
+            'covered_first_pass': 0,
+            'recovered': 0,
+            'uncovered': 0,
+            'retry_rounds': 0,
+            'chunks': 0,
+            'failed_chunks': 0,
+            'uncovered_ids': []
+        }
+        self.last_batch_stats = stats
         
-        for i in range(0, len(reviews_df), chunk_size):
-            chunk = reviews_df.iloc[i:i + chunk_size]
-            logger.info(f"  Processing chunk {i//chunk_size + 1}/{(len(reviews_df)-1)//chunk_size + 1}")
+        llm_topics = []
+        pending = llm_df
+        for round_no in range(EXTRACTION_MAX_RETRIES + 1):
+            if pending.empty:
+                break
+            
+            if round_no > 0:
+                stats['retry_rounds'] = round_no
+                # New neighbours give a review the model skipped a fresh chance
+                pending = pending.sample(frac=1, random_state=round_no)
+                logger.info(f"  🔄 Retry round {round_no}: re-extracting {len(pending)} uncovered reviews")
             
-            chunk_topics = self._process_reviews_chunk(chunk, batch_date)
-            all_topics.extend(chunk_topics)
+            chunks = self._pack_chunks(pending, system_prompt)
+            logger.info(f"  📦 Packed {len(pending)} reviews into {len(chunks)} chunks by token budget")
+            chunk_results = self._run_chunks(chunks, batch_date, system_prompt)
+            stats['chunks'] += len(chunks)
             
-            time.sleep(API_DELAY_SECONDS)
+            uncovered_parts = []
+            for (chunk, _), chunk_topics in zip(chunks, chunk_results):
+                covered = {topic['review_id'] for topic in chunk_topics}
+                chunk_ids = pd.Series(
+                    [row.get('review_id', f'review_{idx}') for idx, row in chunk.iterrows()], index=chunk.index
+                )
+                missing = chunk[~chunk_ids.isin(covered)]
+                if len(missing) == len(chunk):
+                    stats['failed_chunks'] += 1
+                if not missing.empty:
+                    uncovered_parts.append(missing)
+                
+                newly_covered = len(chunk) - len(missing)
+                if round_no == 0:
+                    stats['covered_first_pass'] += newly_covered
+                else:
+                    stats['recovered'] += newly_covered
+                llm_topics.extend(chunk_topics)
+            
+            pending = pd.concat(uncovered_parts) if uncovered_parts else llm_df.iloc[0:0]
+        
+        if not pending.empty:
+            stats['uncovered'] = len(pending)
+            stats['uncovered_ids'] = [row.get('review_id', f'review_{idx}') for idx, row in pending.iterrows()]
+            logger.warning(f"  ⚠️  {len(pending)} reviews still without topics after {EXTRACTION_MAX_RETRIES} retry rounds")
+        
+        logger.info(f"  🎯 Coverage: {stats['covered_first_pass']}/{stats['sent']} first pass, "
+                    f"{stats['recovered']} recovered on retry, {stats['uncovered']} uncovered "
+                    f"({stats['failed_chunks']}/{stats['chunks']} chunks returned nothing)")
+        return llm_topics
+    
+    def _run_chunks(self, chunks: List[Tuple[pd.DataFrame, int]], batch_date: str,
+                    system_prompt: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        if not chunks:
+            return []
+        if LLM_ASYNC_ENABLED and not self._event_loop_running():
+            return asyncio.run(self.aextract_chunks(chunks, batch_date, system_prompt))
+        
+        chunk_results = []
+        for i, (chunk, max_tokens) in enumerate(chunks, 1):
+            logger.info(f"  Processing chunk {i}/{len(chunks)}")
+            chunk_results.append(self._process_reviews_chunk(chunk, batch_date, max_tokens, system_prompt))
+        return chunk_results
+    
+    def _fan_out_topics(self, llm_topics: List[Dict[str, Any]], plan: Dict[str, Any], batch_date: str) -> List[Dict[str, Any]]:
+        """Copy each representative's topics to its duplicates and label the short-circuited reviews"""
+        all_topics = list(llm_topics)
+        
+        topics_by_review = {}
+        for topic in llm_topics:
+            topics_by_review.setdefault(topic['review_id'], []).append(topic)
+        
+        for rep_id, rep_topics in topics_by_review.items():
+            self.deduplicator.remember(plan['keys'][rep_id], rep_topics)
+            for member_id, row in plan['members'].get(rep_id, []):
+                for topic in rep_topics:
+                    all_topics.append(self._make_topic_record(
+                        member_id, row, topic['topic_name'], topic['topic_category'], topic['is_new_topic'], batch_date,
+                        source='duplicate'
+                    ))
+        
+        for review_id, row, remembered in plan['recalled']:
+            for topic_name, category, _ in remembered:
+                all_topics.append(self._make_topic_record(
+                    review_id, row, topic_name, category, False, batch_date, source='recalled'
+                ))
+        
+        for review_id, row in plan['trivial']:
+            all_topics.append(self._make_topic_record(
+                review_id, row, TRIVIAL_REVIEW_TOPIC, TRIVIAL_REVIEW_CATEGORY, False, batch_date, source='trivial'
+            ))
         
-        logger.info(f"✅ Extracted {len(all_topics)} topic mentions from batch {batch_date}")
         return all_topics
     
-    def _process_reviews_chunk(self, reviews_chunk: pd.DataFrame, batch_date: str) -> List[Dict[str, Any]]:
+    def _pack_chunks(self, reviews_df: pd.DataFrame, system_prompt: Optional[str] = None) -> List[Tuple[pd.DataFrame, int]]:
+        """Split reviews into chunks that fit the context window, each with its completion budget"""
+        if reviews_df.empty:
+            return []
+        
+        template_tokens = (
+            self.tokens.count(system_prompt or self.system_prompt)
+            + self.tokens.count(self._create_topic_extraction_prompt(''))
+        )
+        token_budget = MODEL_CONTEXT_WINDOW - template_tokens - CONTEXT_SAFETY_MARGIN
+        
+        # Handles grow with chunk size; r99 is a safe upper bound for the estimate
+        review_costs = [
+            self.tokens.count(self._review_line('r99', row)) + 1
+            for _, row in reviews_df.iterrows()
+        ]
+        
+        spans = pack_by_budget(
+            review_costs, token_budget,
+            output_base=OUTPUT_TOKENS_BASE,
+            output_per_item=OUTPUT_TOKENS_PER_REVIEW,
+            max_output=LLM_MAX_OUTPUT_TOKENS,
+            max_items=MAX_REVIEWS_PER_CHUNK
+        )
+        return [(reviews_df.iloc[start:end], max_tokens) for start, end, max_tokens in spans]
+    
+    async def aextract_chunks(self, chunks: List[Tuple[pd.DataFrame, int]], batch_date: str,
+                              system_prompt: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """Send chunks concurrently (capped by LLM_MAX_CONCURRENCY), results in chunk order"""
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        try:
+            tasks = [
+                self._process_reviews_chunk_async(chunk, batch_date, max_tokens, semaphore, i, len(chunks), system_prompt)
+                for i, (chunk, max_tokens) in enumerate(chunks, 1)
+            ]
+            return await asyncio.gather(*tasks)
+        finally:
+            await self.llm.aclose()
+    
+    @staticmethod
+    def _event_loop_running() -> bool:
         try:
-            reviews_text = self._prepare_reviews_for_llm(reviews_chunk)
-            prompt = self._create_topic_extraction_prompt(reviews_text)
-            llm_response = self.llm.generate(prompt)
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+    
+    def _process_reviews_chunk(self, reviews_chunk: pd.DataFrame, batch_date: str, max_tokens: int,
+                               system_prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+        try:
+            prompt = self._build_chunk_prompt(reviews_chunk)
+            llm_response = self.llm.generate(prompt, max_tokens=max_tokens, system_prompt=system_prompt or self.system_prompt)
             extracted_topics = self._parse_llm_response(llm_response, reviews_chunk, batch_date)
             return extracted_topics
             
@@ -62,92 +339,151 @@ class TopicExtractionAgent:
             logger.error(f"❌ Error processing reviews chunk: {e}")
             return []
     
+    async def _process_reviews_chunk_async(self, reviews_chunk: pd.DataFrame, batch_date: str, max_tokens: int,
+                                           semaphore: asyncio.Semaphore, chunk_no: int, total_chunks: int,
+                                           system_prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+        try:
+            prompt = self._build_chunk_prompt(reviews_chunk)
+            system_prompt = system_prompt or self.system_prompt
+            async with semaphore:
+                logger.info(f"  Processing chunk {chunk_no}/{total_chunks}")
+                if LLM_STREAMING_ENABLED:
+                    return await self._astream_and_parse(prompt, max_tokens, reviews_chunk, batch_date, system_prompt)
+                llm_response = await self.llm.agenerate(prompt, max_tokens=max_tokens, system_prompt=system_prompt)
+            return self._parse_llm_response(llm_response, reviews_chunk, batch_date)
+            
+        except Exception as e:
+            logger.error(f"❌ Error processing reviews chunk: {e}")
+            return []
+    
+    def _build_chunk_prompt(self, reviews_chunk: pd.DataFrame) -> str:
+        reviews_text = self._prepare_reviews_for_llm(reviews_chunk)
+        return self._create_topic_extraction_prompt(reviews_text)
+    
+    @staticmethod
+    def _review_line(handle: str, row: pd.Series) -> str:
+        text = ' '.join(str(row['content']).split())
+        return f"{handle} ({int(row['score'])}★): {text}"
+    
     def _prepare_reviews_for_llm(self, reviews_chunk: pd.DataFrame) -> str:
-        reviews_list = []
-        for idx, row in reviews_chunk.iterrows():
-            review_id = row.get('review_id', f'review_{idx}')
-            content = row['content']
-            score = row['score']
-            reviews_list.append({
-                'id': review_id,
-                'text': content,
-                'rating': int(score)
-            })
-        
-        return json.dumps(reviews_list, ensure_ascii=False)
-    
-    def _create_topic_extraction_prompt(self, reviews_json: str) -> str:
-        prompt = f"""Analyze these app reviews and extract specific topics/issues/requests mentioned.
+        """One line per review, addressed by a short per-chunk handle (r1, r2, ...) instead of its UUID"""
+        return '\n'.join(
+            self._review_line(f'r{n}', row) for n, (_, row) in enumerate(reviews_chunk.iterrows(), 1)
+        )
+    
+    def _create_system_prompt(self) -> str:
+        """Static instructions and seed topics, identical for every call so providers can cache the prefix"""
+        return f"""You are an expert at analyzing app reviews and extracting topics. Always respond with valid JSON.
+
+Analyze the app reviews you are given and extract specific topics/issues/requests mentioned.
 
 SEED TOPICS (use as reference, but identify new ones too):
 {', '.join(self.seed_topics)}
 
-REVIEWS (JSON):
-{reviews_json}
+Each review is one line: "<handle> (<rating>★): <text>".
 
 INSTRUCTIONS:
 1. For each review, identify ALL topics mentioned
 2. Consolidate similar phrases (e.g., "late delivery", "delayed order" → "Delivery issue")
 3. Categorize as: issue, request, or feedback
 4. Create clear, concise topic names (max 5 words)
-5. Map each topic to review IDs where it appears
+5. Map each topic to the handles of the reviews where it appears
 
 OUTPUT (Valid JSON only):
-{{
-  "topics": [
-    {{
-      "topic_name": "clear topic name",
-      "category": "issue|request|feedback",
-      "review_ids": ["review_id1", "review_id2"],
-      "is_new": true
-    }}
-  ]
-}}
+{{"topics": [{{"topic_name": "clear topic name", "category": "issue|request|feedback", "review_ids": ["r1", "r2"], "is_new": true}}]}}
 
 Respond with ONLY the JSON, no other text."""
-        
-        return prompt
+    
+    def _create_cluster_system_prompt(self) -> str:
+        """Cluster-naming variant: each line stands for a group of similar reviews"""
+        return f"""You are an expert at analyzing app reviews and naming groups of similar reviews. Always respond with valid JSON.
+
+Each line is one cluster of similar app reviews: "<handle> (<average rating>★): [<size> reviews] <sample> | <sample> | ...".
+The samples are the most typical reviews of the cluster.
+
+SEED TOPICS (use as reference, but identify new ones too):
+{', '.join(self.seed_topics)}
+
+INSTRUCTIONS:
+1. Name the topics that the reviews of each cluster share (usually one)
+2. Prefer a seed topic when it fits; reuse the same name for clusters about the same thing
+3. Categorize as: issue, request, or feedback
+4. Create clear, concise topic names (max 5 words)
+5. Map each topic to the handles of the clusters it describes
+
+OUTPUT (Valid JSON only):
+{{"topics": [{{"topic_name": "clear topic name", "category": "issue|request|feedback", "review_ids": ["r1", "r2"], "is_new": true}}]}}
+
+Respond with ONLY the JSON, no other text."""
+    
+    def _create_topic_extraction_prompt(self, reviews_text: str) -> str:
+        return f"REVIEWS:\n{reviews_text}"
     
     def _parse_llm_response(self, llm_response: str, reviews_chunk: pd.DataFrame, batch_date: str) -> List[Dict[str, Any]]:
+        parser = IncrementalTopicParser()
+        topics = parser.feed(llm_response) + parser.close()
+        return self._topics_to_records(topics, parser, reviews_chunk, batch_date)
+    
+    async def _astream_and_parse(self, prompt: str, max_tokens: int, reviews_chunk: pd.DataFrame, batch_date: str,
+                                 system_prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Parse topic objects while the completion is still streaming in"""
+        parser = IncrementalTopicParser()
+        topics = []
+        async for delta in self.llm.astream(prompt, max_tokens=max_tokens, system_prompt=system_prompt or self.system_prompt):
+            topics.extend(parser.feed(delta))
+        topics.extend(parser.close())
+        return self._topics_to_records(topics, parser, reviews_chunk, batch_date)
+    
+    def _topics_to_records(self, topics: List[Dict[str, Any]], parser: IncrementalTopicParser,
+                           reviews_chunk: pd.DataFrame, batch_date: str) -> List[Dict[str, Any]]:
         try:
-            json_match = re.search(r'\{.*\}', llm_response, re.DOTALL)
-            if not json_match:
+            report = parser.report()
+            if not topics:
                 logger.warning("No JSON found in LLM response")
                 return []
-            
-            json_str = json_match.group()
-            parsed_data = json.loads(json_str)
+            if report['repaired'] or report['skipped'] or report['truncated']:
+                logger.warning(f"⚠️  Salvaged malformed LLM output: {report['parsed']} clean, {report['repaired']} repaired, "
+                               f"{report['skipped']} unrecoverable topics (truncated={report['truncated']})")
             
             topics_data = []
-            review_id_map = {row.get('review_id', f'review_{idx}'): row for idx, row in reviews_chunk.iterrows()}
+            # Handles are positional, matching _prepare_reviews_for_llm
+            handle_map = {
+                f'r{n}': (row.get('review_id', f'review_{idx}'), row)
+                for n, (idx, row) in enumerate(reviews_chunk.iterrows(), 1)
+            }
             
-            for topic in parsed_data.get('topics', []):
-                topic_name = topic.get('topic_name', '').strip()
+            for topic in topics:
+                topic_name = str(topic.get('topic_name') or '').strip()
                 category = topic.get('category', 'issue')
                 review_ids = topic.get('review_ids', [])
                 
-                if not topic_name:
+                if not topic_name or not isinstance(review_ids, list):
                     continue
                 
-                for review_id in review_ids:
-                    if review_id in review_id_map:
-                        row = review_id_map[review_id]
-                        topic_data = {
-                            'review_id': review_id,
-                            'topic_name': topic_name,
-                            'topic_category': category,
-                            'date': row['date'],
-                            'batch_date': batch_date,
-                            'is_seed_topic': any(seed.lower() in topic_name.lower() for seed in self.seed_topics),
-                            'is_new_topic': topic.get('is_new', False)
-                        }
-                        topics_data.append(topic_data)
+                for handle in review_ids:
+                    handle = str(handle).strip().lower()
+                    if handle in handle_map:
+                        review_id, row = handle_map[handle]
+                        topics_data.append(self._make_topic_record(
+                            review_id, row, topic_name, category, topic.get('is_new', False), batch_date
+                        ))
             
             return topics_data
             
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ JSON parsing error: {e}")
-            return []
         except Exception as e:
             logger.error(f"❌ Error parsing LLM response: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def _make_topic_record(self, review_id: str, row: pd.Series, topic_name: str, category: str,
+                           is_new: bool, batch_date: str, source: str = 'llm') -> Dict[str, Any]:
+        # label_source: 'llm', 'cluster', a pre-labeler's name, 'duplicate', 'recalled' or 'trivial'
+        return {
+            'review_id': review_id,
+            'topic_name': topic_name,
+            'topic_category': category,
+            'date': row['date'],
+            'batch_date': batch_date,
+            'is_seed_topic': any(seed.lower() in topic_name.lower() for seed in self.seed_topics),
+            'is_new_topic': is_new,
+            'label_source': source
+        }
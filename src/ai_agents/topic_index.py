@@ -0,0 +1,206 @@
+import logging
+import json
+import numpy as np
+from pathlib import Path
+from typing import List, Tuple, Optional
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import TOPIC_INDEX_INT8, TOPIC_INDEX_ANN_THRESHOLD, TOPIC_INDEX_ANN_PROBES
+
+logger = logging.getLogger(__name__)
+
+class NumpyTopicIndex:
+    """
+    In-process cosine index over canonical topic names.
+
+    Rows are unit-length, so a matrix product gives cosine similarity directly.
+    With int8 quantization each row is stored as int8 codes plus one float
+    scale. Above TOPIC_INDEX_ANN_THRESHOLD rows an IVF layer (k-means cells,
+    a few probed per query) replaces the full scan.
+    """
+
+    def __init__(self, snapshot_dir: str, quantize_int8: bool = TOPIC_INDEX_INT8,
+                 ann_threshold: int = TOPIC_INDEX_ANN_THRESHOLD, ann_probes: int = TOPIC_INDEX_ANN_PROBES):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_file = self.snapshot_dir / 'topic_index.npz'
+        self.names_file = self.snapshot_dir / 'topic_index_names.json'
+
+        self.quantize_int8 = quantize_int8
+        self.ann_threshold = ann_threshold
+        self.ann_probes = ann_probes
+
+        self.names: List[str] = []
+        self._positions = {}
+        self.vectors: Optional[np.ndarray] = None  # float32 rows, or int8 codes when quantized
+        self.scales: Optional[np.ndarray] = None
+
+        # IVF layer, built lazily once the index is large enough
+        self.centroids: Optional[np.ndarray] = None
+        self.cell_of: Optional[np.ndarray] = None
+        self._trained_size = 0
+
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def count(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    def add(self, names: List[str], embeddings: np.ndarray):
+        """Add names not already indexed; embeddings are normalized here"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        keep = []
+        for i, name in enumerate(names):
+            if name not in self._positions:
+                self._positions[name] = len(self.names)
+                self.names.append(name)
+                keep.append(i)
+        if not keep:
+            return
+
+        rows = embeddings[keep]
+        rows = rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        codes, scales = self._encode_rows(rows)
+
+        if self.vectors is None:
+            self.vectors, self.scales = codes, scales
+        else:
+            self.vectors = np.vstack([self.vectors, codes])
+            self.scales = np.concatenate([self.scales, scales])
+
+        if self.centroids is not None:
+            self.cell_of = np.concatenate([self.cell_of, np.argmax(rows @ self.centroids.T, axis=1)])
+
+    def clear(self):
+        self.names = []
+        self._positions = {}
+        self.vectors = self.scales = None
+        self.centroids = self.cell_of = None
+        self._trained_size = 0
+
+    def _encode_rows(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.quantize_int8:
+            return rows.astype(np.float32), np.ones(len(rows), dtype=np.float32)
+        scales = np.maximum(np.abs(rows).max(axis=1), 1e-12) / 127.0
+        codes = np.round(rows / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of queries against all rows (or the given row positions)"""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        scales = self.scales if rows is None else self.scales[rows]
+        if self.quantize_int8:
+            return (queries @ vectors.T.astype(np.float32)) * scales
+        return queries @ vectors.T
+
+    def search(self, queries: np.ndarray, top_k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (positions, similarities), each shaped (len(queries), k); -1 pads missing hits"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(top_k, len(self.names))
+        if k == 0 or len(queries) == 0:
+            return np.full((len(queries), top_k), -1), np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        if len(self.names) >= self.ann_threshold:
+            self._maybe_train()
+            return self._search_ivf(queries, top_k)
+        return self._top_k(self._scores(queries), np.arange(len(self.names)), top_k)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, positions: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(top_k, scores.shape[1])
+        if k < scores.shape[1]:
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            best = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best, best_scores = np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+        found = np.full((len(scores), top_k), -1)
+        found_scores = np.full((len(scores), top_k), -np.inf, dtype=np.float32)
+        found[:, :k], found_scores[:, :k] = positions[best], best_scores
+        return found, found_scores
+
+    def _search_ivf(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        probes = min(self.ann_probes, len(self.centroids))
+        cells = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :probes]
+
+        found = np.full((len(queries), top_k), -1)
+        found_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for i, query_cells in enumerate(cells):
+            candidates = np.flatnonzero(np.isin(self.cell_of, query_cells))
+            if len(candidates) == 0:
+                continue
+            scores = self._scores(queries[i:i + 1], candidates)
+            found[i:i + 1], found_scores[i:i + 1] = self._top_k(scores, candidates, top_k)
+        return found, found_scores
+
+    def _maybe_train(self):
+        """(Re)build IVF cells when first needed and whenever the index has doubled since"""
+        if self.centroids is not None and len(self.names) < 2 * self._trained_size:
+            return
+
+        rows = self._dequantized()
+        cells = max(int(np.sqrt(len(rows))), 1)
+        generator = np.random.RandomState(0)
+        centroids = rows[generator.choice(len(rows), cells, replace=False)]
+
+        # Spherical k-means: a handful of iterations is plenty for cell assignment
+        for _ in range(10):
+            assignment = np.argmax(rows @ centroids.T, axis=1)
+            for cell in range(cells):
+                members = rows[assignment == cell]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[cell] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        self.centroids = centroids.astype(np.float32)
+        self.cell_of = np.argmax(rows @ self.centroids.T, axis=1)
+        self._trained_size = len(rows)
+        logger.info(f"Topic index: built {cells} IVF cells over {len(rows)} topics")
+
+    def _dequantized(self) -> np.ndarray:
+        rows = self.vectors.astype(np.float32) * self.scales[:, None]
+        return rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+
+    def save(self):
+        if self.vectors is None:
+            for path in (self.snapshot_file, self.names_file):
+                if path.exists():
+                    path.unlink()
+            return
+        np.savez(self.snapshot_file, vectors=self.vectors, scales=self.scales)
+        with open(self.names_file, 'w', encoding='utf-8') as f:
+            json.dump({'names': self.names, 'int8': self.quantize_int8}, f, ensure_ascii=False)
+
+    def load(self):
+        if not (self.snapshot_file.exists() and self.names_file.exists()):
+            return
+        try:
+            with open(self.names_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with np.load(self.snapshot_file) as snapshot:
+                vectors, scales = snapshot['vectors'], snapshot['scales']
+            if len(vectors) != len(meta['names']):
+                logger.warning("⚠️  Topic index snapshot out of sync, ignoring it")
+                return
+
+            if meta.get('int8') != self.quantize_int8:
+                # Re-encode so the TOPIC_INDEX_INT8 setting can change between runs
+                rows = vectors.astype(np.float32) * scales[:, None]
+                vectors, scales = self._encode_rows(rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12))
+
+            self.names = meta['names']
+            self._positions = {name: i for i, name in enumerate(self.names)}
+            self.vectors, self.scales = vectors, scales
+            logger.info(f"✅ Topic index snapshot loaded: {len(self.names)} topics")
+        except Exception as e:
+            logger.error(f"❌ Could not load topic index snapshot: {e}")
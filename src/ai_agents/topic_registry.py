@@ -0,0 +1,129 @@
+import logging
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Tuple
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import DB_PATH
+from data_collection.sqlite_manager import get_connection_manager
+
+logger = logging.getLogger(__name__)
+
+class TopicRegistry:
+    """
+    The topics dimension (integer id, name, category, first-seen date) and the
+    alias map from every raw name ever consolidated to its canonical topic id.
+    Aliases are mirrored in memory so known names resolve without a query.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self.db = get_connection_manager(db_path)
+        self._lock = threading.Lock()
+        self.aliases: Dict[str, int] = {}
+        self.names: Dict[int, str] = {}
+
+        conn = self.db.connection()
+        self.setup_tables(conn)
+        self._load(conn)
+        logger.info(f"✅ Topic registry ready: {len(self.names)} topics, {len(self.aliases)} aliases")
+
+    @staticmethod
+    def setup_tables(conn: sqlite3.Connection):
+        """Create the dimension tables and give existing mentions a topic_id"""
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topics (
+                topic_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic_name TEXT NOT NULL UNIQUE,
+                topic_category TEXT,
+                first_seen DATE,
+                is_seed_topic BOOLEAN DEFAULT FALSE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topic_aliases (
+                alias TEXT PRIMARY KEY,
+                topic_id INTEGER NOT NULL,
+                FOREIGN KEY (topic_id) REFERENCES topics (topic_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alias_topic ON topic_aliases(topic_id)')
+
+        has_mentions = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'processed_topics'"
+        ).fetchone()
+        if has_mentions:
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(processed_topics)')}
+            if 'topic_id' not in columns:
+                cursor.execute('ALTER TABLE processed_topics ADD COLUMN topic_id INTEGER REFERENCES topics (topic_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_topic_id_date ON processed_topics(topic_id, date)')
+            TopicRegistry._backfill(cursor)
+
+        conn.commit()
+
+    @staticmethod
+    def _backfill(cursor: sqlite3.Cursor):
+        """Mentions stored before the dimension existed: each distinct name becomes its own topic"""
+        cursor.execute('''
+            INSERT OR IGNORE INTO topics (topic_name, topic_category, first_seen, is_seed_topic)
+            SELECT topic_name, MIN(topic_category), MIN(date), COALESCE(MAX(is_seed_topic), FALSE)
+            FROM processed_topics
+            WHERE topic_id IS NULL
+            GROUP BY topic_name
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO topic_aliases (alias, topic_id)
+            SELECT topic_name, topic_id FROM topics
+        ''')
+        cursor.execute('''
+            UPDATE processed_topics
+            SET topic_id = (SELECT topic_id FROM topic_aliases WHERE alias = processed_topics.topic_name)
+            WHERE topic_id IS NULL
+        ''')
+        if cursor.rowcount > 0:
+            logger.info(f"Linked {cursor.rowcount} existing mentions to topic ids")
+
+    def _load(self, conn: sqlite3.Connection):
+        self.names = dict(conn.execute('SELECT topic_id, topic_name FROM topics').fetchall())
+        self.aliases = dict(conn.execute('SELECT alias, topic_id FROM topic_aliases').fetchall())
+
+    def canonical_name(self, alias: str) -> Optional[str]:
+        """Canonical topic name for a known raw name, else None"""
+        topic_id = self.aliases.get(alias)
+        return self.names.get(topic_id) if topic_id is not None else None
+
+    def topic_id(self, name: str) -> Optional[int]:
+        return self.aliases.get(name)
+
+    def register(self, aliases: Dict[str, str], topics: List[Tuple[str, str, str, bool]]):
+        """
+        Record canonical topics as (name, category, first_seen, is_seed) and
+        raw -> canonical aliases; canonical names are aliases of themselves.
+        """
+        new_topics = [topic for topic in topics if topic[0] not in self.aliases]
+        new_aliases = {alias: canonical for alias, canonical in aliases.items() if alias not in self.aliases}
+        if not new_topics and not new_aliases:
+            return
+
+        with self._lock:
+            try:
+                with self.db.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.executemany('''
+                        INSERT OR IGNORE INTO topics (topic_name, topic_category, first_seen, is_seed_topic)
+                        VALUES (?, ?, ?, ?)
+                    ''', new_topics)
+                    for name, *_ in new_topics:
+                        new_aliases.setdefault(name, name)
+
+                    cursor.executemany('''
+                        INSERT OR IGNORE INTO topic_aliases (alias, topic_id)
+                        SELECT ?, topic_id FROM topics WHERE topic_name = ?
+                    ''', list(new_aliases.items()))
+                self._load(conn)
+            except Exception as e:
+                logger.error(f"❌ Error registering topics: {e}")
+                raise
@@ -0,0 +1,200 @@
+import logging
+import ast
+import json
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOPICS_ARRAY = re.compile(r'"topics"\s*:\s*\[')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+# A value cut off mid-literal or mid-number ("is_new": tr) is dropped along with its key
+_PARTIAL_VALUE = r'(?:t|tr|tru|f|fa|fal|fals|n|nu|nul|-?\d*\.?\d*)'
+_DANGLING_TAIL = re.compile(rf'(,?\s*"[^"]*"\s*:\s*{_PARTIAL_VALUE}|,\s*{_PARTIAL_VALUE})$')
+_ORPHAN_KEY = re.compile(r',?\s*"[^"]*"$')
+_CLOSERS = {'{': '}', '[': ']'}
+
+class IncrementalTopicParser:
+    """
+    Tolerant streaming parser for {"topics": [...]} LLM output.
+
+    Text can be fed in arbitrary pieces; every element of the topics array is
+    returned as soon as its closing brace arrives. Elements with small syntax
+    slips are repaired, and a truncated final element is closed off on close().
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.in_array = False
+        self.finished = False
+
+        # State of the element currently being scanned
+        self.element_start: Optional[int] = None
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escaped = False
+
+        self.parsed = 0
+        self.repaired = 0
+        self.skipped = 0
+        self.truncated = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Add more output and return any topic objects completed by it"""
+        if not text or self.finished:
+            return []
+        self.buffer += text
+        return self._scan()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Finish the stream, salvaging a truncated trailing element if possible"""
+        if self.finished:
+            return []
+        self.finished = True
+
+        if not self.in_array:
+            # No topics array at all; the whole response may still be one salvageable object
+            start, end = self.buffer.find('{'), self.buffer.rfind('}')
+            fallback, _ = self._loads_lenient(self.buffer[start:end + 1]) if 0 <= start < end else (None, False)
+            if isinstance(fallback, dict) and isinstance(fallback.get('topics'), list):
+                topics = [t for t in fallback['topics'] if isinstance(t, dict)]
+                self.repaired += len(topics)
+                return topics
+            return []
+
+        self.truncated = True
+        if self.element_start is None:
+            return []
+
+        fragment = self._close_fragment(self.buffer[self.element_start:])
+        topic, _ = self._loads_lenient(fragment)
+        if isinstance(topic, dict) and topic.get('topic_name'):
+            self.repaired += 1
+            return [topic]
+
+        self.skipped += 1
+        return []
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'parsed': self.parsed,
+            'repaired': self.repaired,
+            'skipped': self.skipped,
+            'truncated': self.truncated
+        }
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        topics = []
+
+        if not self.in_array:
+            match = _TOPICS_ARRAY.search(self.buffer)
+            if not match:
+                return topics
+            self.in_array = True
+            self.pos = match.end()
+
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            ch = buffer[i]
+
+            if self.element_start is None:
+                if ch == '{':
+                    self.element_start = i
+                    self.stack = ['{']
+                elif ch == ']':
+                    self.finished = True
+                    i += 1
+                    break
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in _CLOSERS:
+                self.stack.append(ch)
+            elif ch in ('}', ']'):
+                if self.stack:
+                    self.stack.pop()
+                if not self.stack:
+                    topic, strict = self._loads_lenient(buffer[self.element_start:i + 1])
+                    if isinstance(topic, dict):
+                        topics.append(topic)
+                        if strict:
+                            self.parsed += 1
+                        else:
+                            self.repaired += 1
+                    else:
+                        self.skipped += 1
+                    self.element_start = None
+            i += 1
+
+        self.pos = i
+        return topics
+
+    @staticmethod
+    def _loads_lenient(text: str) -> Tuple[Any, bool]:
+        """Returns (value, parsed_without_repair); value is None if unrecoverable"""
+        try:
+            return json.loads(text), True
+        except (json.JSONDecodeError, ValueError):
+            pass
+
+        fixed = _TRAILING_COMMA.sub(r'\1', text)
+        fixed = fixed.replace('“', '"').replace('”', '"')
+        try:
+            return json.loads(fixed), False
+        except (json.JSONDecodeError, ValueError):
+            pass
+
+        # Python-style output: single quotes, True/False/None
+        try:
+            return ast.literal_eval(fixed), False
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return None, False
+
+    @staticmethod
+    def _close_fragment(fragment: str) -> str:
+        """Drop a cut-off string, value or dangling key/comma, then close open brackets"""
+        stack = []
+        in_string = escaped = False
+        string_start = 0
+        for i, ch in enumerate(fragment):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+                string_start = i
+            elif ch in _CLOSERS:
+                stack.append(ch)
+            elif ch in ('}', ']') and stack:
+                stack.pop()
+
+        # A half-written string (e.g. a cut-off topic name) is worse than none
+        if in_string:
+            fragment = fragment[:string_start]
+        fragment = _DANGLING_TAIL.sub('', fragment.rstrip())
+        if stack and stack[-1] == '{':
+            # A key cut off before its colon; inside an array the same text is a complete element
+            fragment = _ORPHAN_KEY.sub('', fragment)
+        return fragment + ''.join(_CLOSERS[opener] for opener in reversed(stack))
+
+if __name__ == "__main__":
+    # Truncated outputs the parser must salvage: each should yield the complete first topic and "Crash"
+    head = '{"topics": [{"topic_name": "Late delivery", "review_ids": ["r1"]}, {"topic_name": "Crash", "review_ids": ["r2"]'
+    for tail in ['', ',', ', "is_new"', ', "is_new":', ', "is_new": tr', ', "is_new": fals', ', "score": -1.', ', "is_new": "ye']:
+        parser = IncrementalTopicParser()
+        topics = parser.feed(head + tail) + parser.close()
+        names = [topic['topic_name'] for topic in topics]
+        status = '✅' if names == ['Late delivery', 'Crash'] else '❌'
+        print(f"{status} ...{tail!r:>20} -> {names} {parser.report()}")
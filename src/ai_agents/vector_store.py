@@ -1,65 +1,173 @@
-import chromadb
+import hashlib
 import logging
+import numpy as np
 from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import EMBEDDING_CACHE_ENABLED, TOPIC_INDEX_BACKEND, TOPIC_INDEX_DIR
+from .embedding_backends import create_embedding_backend
+from .embedding_cache import EmbeddingCache
+from .topic_index import NumpyTopicIndex
 
 logger = logging.getLogger(__name__)
 
 class TopicVectorStore:
-    def __init__(self, persist_directory: str = "./data/chroma_db"):
+    def __init__(self, persist_directory: str = "./data/chroma_db", backend: str = TOPIC_INDEX_BACKEND,
+                 index_directory: str = TOPIC_INDEX_DIR):
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
         
-        self.client = chromadb.PersistentClient(path=str(self.persist_directory))
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The model itself loads on the first cache miss, so warm runs may never load it
+        self.embedder = create_embedding_backend()
+        self.embedding_cache = EmbeddingCache(self.embedder.cache_name) if EMBEDDING_CACHE_ENABLED else None
         
-        self.collection = self.client.get_or_create_collection(
-            name="topics",
-            metadata={"description": "Topic embeddings for semantic similarity"}
-        )
+        self.client = None
+        self.collection = None
+        self.index = None
+        if backend == 'numpy':
+            self.index = NumpyTopicIndex(index_directory)
+            if len(self.index) == 0:
+                self._import_chroma_topics()
+        elif backend == 'chroma':
+            import chromadb
+            self.client = chromadb.PersistentClient(path=str(self.persist_directory))
+            # New collections use cosine space; older ones keep the L2 space they were created with
+            self.collection = self.client.get_or_create_collection(
+                name="topics",
+                metadata={"description": "Topic embeddings for semantic similarity", "hnsw:space": "cosine"}
+            )
+        else:
+            raise ValueError(f"❌ Unknown topic index backend: {backend}")
         
-        logger.info("✅ Topic Vector Store initialized")
+        logger.info(f"✅ Topic Vector Store initialized ({backend} index, {self.topic_count()} topics)")
     
-    def add_topics(self, topics: List[str]):
-        """Add topics to vector store"""
-        if not topics:
+    def _import_chroma_topics(self):
+        """Seed an empty in-process index from topics an earlier run stored in Chroma"""
+        if not (self.persist_directory / 'chroma.sqlite3').exists():
+            return
+        try:
+            import chromadb
+            collection = chromadb.PersistentClient(path=str(self.persist_directory)).get_collection("topics")
+            stored = collection.get(include=['documents', 'embeddings'])
+        except Exception as e:
+            logger.warning(f"⚠️  No Chroma topics imported: {e}")
             return
+        if stored['documents']:
+            self.index.add(stored['documents'], np.asarray(stored['embeddings'], dtype=np.float32))
+            self.index.save()
+            logger.info(f"✅ Imported {len(stored['documents'])} topics from Chroma")
+    
+    def topic_count(self) -> int:
+        return self.index.count() if self.index is not None else self.collection.count()
+    
+    def _chroma_similarity(self, distance: float) -> float:
+        """Cosine similarity from a Chroma distance, whichever space the collection uses"""
+        if (self.collection.metadata or {}).get('hnsw:space', 'l2') == 'l2':
+            # Squared L2 between unit vectors is 2 - 2cos
+            return 1 - distance / 2
+        return 1 - distance
+    
+    def _query(self, embeddings: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """Nearest stored topics per query embedding as [{'topic', 'similarity'}], best first"""
+        if self.topic_count() == 0:
+            return [[] for _ in range(len(embeddings))]
         
-        embeddings = self.embedding_model.encode(topics).tolist()
-        ids = [f"topic_{hash(topic)}" for topic in topics]
+        if self.index is not None:
+            positions, scores = self.index.search(embeddings, top_k=top_k)
+            return [
+                [{'topic': self.index.names[pos], 'similarity': float(score)} for pos, score in zip(row, row_scores) if pos >= 0]
+                for row, row_scores in zip(positions, scores)
+            ]
         
-        self.collection.add(
-            embeddings=embeddings,
-            documents=topics,
-            ids=ids
+        results = self.collection.query(
+            query_embeddings=np.asarray(embeddings).tolist(),
+            n_results=min(top_k, self.collection.count())
         )
+        return [
+            [{'topic': doc, 'similarity': self._chroma_similarity(distance)} for doc, distance in zip(docs, distances)]
+            for docs, distances in zip(results['documents'], results['distances'])
+        ]
+    
+    def encode(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Unit-length float32 embeddings, one row per text"""
+        return self.embedder.encode(texts, batch_size=batch_size)
+    
+    def encode_topics(self, topics: List[str]) -> np.ndarray:
+        """encode() for short, recurring strings such as topic names, served from the embedding cache"""
+        if self.embedding_cache is None:
+            return self.encode(topics)
+        return self.embedding_cache.encode(topics, self.encode)
+    
+    def encode_many(self, texts: List[str], batch_size: int = 128) -> np.ndarray:
+        """Like encode(), but spreads large backfills over all CPU cores"""
+        return self.embedder.encode_many(texts, batch_size=batch_size)
+    
+    def add_topics(self, topics: List[str], embeddings: Optional[np.ndarray] = None):
+        """Add topics to vector store, reusing embeddings when the caller already has them"""
+        if not topics:
+            return
+        
+        if embeddings is None:
+            embeddings = self.encode_topics(topics)
+        
+        if self.index is not None:
+            self.index.add(topics, embeddings)
+            self.index.save()
+        else:
+            # Stable ids, so re-adding a known topic in a later run is a no-op
+            ids = [f"topic_{hashlib.md5(topic.encode('utf-8')).hexdigest()}" for topic in topics]
+            self.collection.add(
+                embeddings=np.asarray(embeddings).tolist(),
+                documents=topics,
+                ids=ids
+            )
         
         logger.info(f"✅ Added {len(topics)} topics to vector store")
     
-    def find_similar_topics(self, query_topic: str, threshold: float = 0.7, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Find similar topics using semantic similarity"""
-        query_embedding = self.embedding_model.encode([query_topic]).tolist()
-        
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=top_k
-        )
+    def replace_topics(self, topics: List[str], embeddings: Optional[np.ndarray] = None):
+        """Make topics the complete canonical set, dropping everything else"""
+        if embeddings is None:
+            embeddings = self.encode_topics(topics)
         
-        similar_topics = []
-        for i, (doc, distance) in enumerate(zip(results['documents'][0], results['distances'][0])):
-            similarity = 1 - distance
-            if similarity >= threshold:
-                similar_topics.append({
-                    'topic': doc,
-                    'similarity': similarity
-                })
+        if self.index is not None:
+            self.index.clear()
+            self.index.add(topics, embeddings)
+            self.index.save()
+        else:
+            name = self.collection.name
+            metadata = self.collection.metadata
+            self.client.delete_collection(name)
+            self.collection = self.client.get_or_create_collection(name=name, metadata=metadata)
+            self.add_topics(topics, embeddings)
         
-        return similar_topics
+        logger.info(f"✅ Topic set replaced with {len(topics)} canonical topics")
+    
+    def find_similar_topics(self, query_topic: str, threshold: float = 0.7, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Find similar topics using semantic similarity"""
+        matches = self._query(self.encode_topics([query_topic]), top_k)[0]
+        return [match for match in matches if match['similarity'] >= threshold]
     
     def get_canonical_topic(self, topic: str, threshold: float = 0.8) -> Optional[str]:
         """Get the canonical version of a topic if similar one exists"""
-        similar = self.find_similar_topics(topic, threshold=threshold, top_k=1)
-        if similar:
-            return similar[0]['topic']
-        return None
\ No newline at end of file
+        return self.get_canonical_topics([topic], threshold=threshold)[0]
+    
+    def get_canonical_topics(self, topics: List[str], threshold: float = 0.8,
+                             embeddings: Optional[np.ndarray] = None) -> List[Optional[str]]:
+        """Batched get_canonical_topic: one encode and one query for all topics"""
+        if not topics or self.topic_count() == 0:
+            return [None] * len(topics)
+        
+        if embeddings is None:
+            embeddings = self.encode_topics(topics)
+        
+        canonical = []
+        for matches in self._query(embeddings, top_k=1):
+            if matches and matches[0]['similarity'] >= threshold:
+                canonical.append(matches[0]['topic'])
+            else:
+                canonical.append(None)
+        return canonical
\ No newline at end of file
@@ -0,0 +1,137 @@
+import logging
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from typing import List, Iterable, Optional
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import COLUMNAR_DIR
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Columns of the mirrored SQLite tables, minus the date they are partitioned on. Fixed types
+# keep every partition readable as one dataset, even where a day's column is all NULL.
+COLUMNAR_COLUMNS = {
+    'raw_reviews': [
+        ('review_id', 'string'), ('content', 'string'), ('score', 'int64'), ('at', 'string'),
+        ('app_id', 'string'), ('thumbs_up_count', 'int64'), ('batch_date', 'string'), ('created_at', 'string')
+    ],
+    'processed_topics': [
+        ('id', 'int64'), ('review_id', 'string'), ('topic_name', 'string'), ('topic_category', 'string'),
+        ('batch_date', 'string'), ('is_seed_topic', 'bool'), ('is_new_topic', 'bool'), ('topic_id', 'int64'),
+        ('label_source', 'string'), ('created_at', 'string')
+    ]
+}
+
+class ColumnarStore:
+    """
+    Parquet copies of raw_reviews and processed_topics, one hive-style
+    directory per date (table/date=YYYY-MM-DD/part-0.parquet).
+
+    SQLite stays the source of truth: after each batch the dates it touched
+    are re-exported whole, so repeating a batch never duplicates rows. Reads
+    prune partitions by date, project columns and memory-map the files.
+    """
+
+    def __init__(self, root_dir: str = COLUMNAR_DIR):
+        if pa is None:
+            raise ImportError("pyarrow is required for the columnar store")
+        self.root = Path(root_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+        self.schemas = {
+            table: pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in columns])
+            for table, columns in COLUMNAR_COLUMNS.items()
+        }
+
+    @staticmethod
+    def available() -> bool:
+        return pa is not None
+
+    def _partition_dir(self, table: str, day: str) -> Path:
+        return self.root / table / f'date={day}'
+
+    def sync_dates(self, conn: sqlite3.Connection, table: str, dates: Iterable[str], dates_per_query: int = 31) -> int:
+        """Rewrite the partitions of the given dates from committed SQLite rows; returns rows written"""
+        if table not in COLUMNAR_COLUMNS:
+            raise ValueError(f"❌ Not a columnar table: {table}")
+        dates = sorted(set(dates))
+        written = 0
+        for start in range(0, len(dates), dates_per_query):
+            part = dates[start:start + dates_per_query]
+            df = pd.read_sql_query(
+                f"SELECT * FROM {table} WHERE date IN ({','.join('?' * len(part))})", conn, params=part
+            )
+            groups = dict(tuple(df.groupby('date', sort=False))) if not df.empty else {}
+            for day in part:
+                written += self._write_partition(table, day, groups.get(day))
+        return written
+
+    def _write_partition(self, table: str, day: str, df: Optional[pd.DataFrame]) -> int:
+        directory = self._partition_dir(table, day)
+        target = directory / 'part-0.parquet'
+        if df is None or df.empty:
+            if target.exists():
+                target.unlink()
+            return 0
+
+        directory.mkdir(parents=True, exist_ok=True)
+        schema = self.schemas[table]
+        arrow_table = pa.Table.from_pandas(df.reindex(columns=schema.names), preserve_index=False).cast(schema)
+
+        # Write then rename so readers never see half a file; dataset discovery skips dot-files
+        temporary = directory / '.part-0.parquet.tmp'
+        pq.write_table(arrow_table, temporary, compression='zstd')
+        os.replace(temporary, target)
+        return len(df)
+
+    def export_table(self, conn: sqlite3.Connection, table: str) -> int:
+        """Full re-export, for databases filled before the store existed"""
+        dates = [row[0] for row in conn.execute(f'SELECT DISTINCT date FROM {table} WHERE date IS NOT NULL')]
+        written = self.sync_dates(conn, table, dates)
+        logger.info(f"✅ Exported {written} {table} rows to {len(dates)} Parquet partitions")
+        return written
+
+    def dates(self, table: str) -> List[str]:
+        """Dates that have a partition"""
+        return sorted(path.name.split('=', 1)[1] for path in (self.root / table).glob('date=*') if any(path.iterdir()))
+
+    def read_arrow(self, table: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   columns: Optional[List[str]] = None, memory_map: bool = True) -> 'pa.Table':
+        """
+        Arrow table of the rows dated start_date..end_date (ISO strings,
+        inclusive, open when None). Only partitions in range are opened and
+        only the requested columns are decoded.
+        """
+        directory = self.root / table
+        if not directory.exists():
+            raise FileNotFoundError(f"No columnar data for {table} under {self.root}")
+
+        dataset = ds.dataset(
+            str(directory),
+            format='parquet',
+            partitioning=self._partitioning,
+            filesystem=pyarrow.fs.LocalFileSystem(use_mmap=memory_map)
+        )
+        condition = None
+        if start_date is not None:
+            condition = ds.field('date') >= str(start_date)
+        if end_date is not None:
+            upper = ds.field('date') <= str(end_date)
+            condition = upper if condition is None else condition & upper
+        return dataset.to_table(columns=columns, filter=condition)
+
+    def read(self, table: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+             columns: Optional[List[str]] = None, memory_map: bool = True) -> pd.DataFrame:
+        """read_arrow() as a DataFrame"""
+        return self.read_arrow(table, start_date, end_date, columns, memory_map).to_pandas()
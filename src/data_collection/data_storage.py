@@ -1,20 +1,37 @@
 import pandas as pd
 import sqlite3
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from itertools import groupby
 from pathlib import Path
+from typing import List, Tuple, Iterator, Iterable
 import sys
 import os
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from config import DB_PATH
+from config import (
+    DB_PATH, NEAR_DUP_ENABLED, INGEST_PAGE_ROWS, PHASE2_REVIEWS_PER_DAY, COLUMNAR_STORE_ENABLED,
+    REVIEW_SEARCH_ENABLED, REVIEW_SEARCH_PAGE_SIZE
+)
+from .near_duplicates import NearDuplicateIndex
+from .sqlite_manager import get_connection_manager
+from .columnar_store import ColumnarStore
+from .review_search import ReviewSearchIndex
 
 logger = logging.getLogger(__name__)
 
 class DataStorage:
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        self.db = get_connection_manager(db_path)
+        self.near_duplicates = NearDuplicateIndex() if NEAR_DUP_ENABLED else None
+        self.columnar = None
+        if COLUMNAR_STORE_ENABLED:
+            if ColumnarStore.available():
+                self.columnar = ColumnarStore()
+            else:
+                logger.info("pyarrow not installed, Parquet columnar store disabled")
         self.setup_database()
     
     def setup_database(self):
@@ -22,7 +39,7 @@ class DataStorage:
         try:
             Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = self.db.connection()
             cursor = conn.cursor()
             
             # Table for raw reviews
@@ -54,12 +71,23 @@ class DataStorage:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_date ON raw_reviews(date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_batch_date ON raw_reviews(batch_date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_id ON raw_reviews(app_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_date_at ON raw_reviews(date, at)')
+            
+            NearDuplicateIndex.setup_tables(cursor)
+            if REVIEW_SEARCH_ENABLED:
+                ReviewSearchIndex.setup_tables(cursor)
             
             conn.commit()
-            conn.close()
+            
+            if self.near_duplicates:
+                backfilled = self.near_duplicates.backfill(conn)
+                if backfilled:
+                    logger.info(f"Indexed {backfilled} existing reviews for near-duplicate detection")
+            
             logger.info("Database setup completed with batch support")
             
         except Exception as e:
+            self.db.connection().rollback()
             logger.error(f"Database setup failed: {e}")
             raise
     
@@ -70,37 +98,11 @@ class DataStorage:
             return
             
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.db.connection()
             cursor = conn.cursor()
             
-            # Prepare data for insertion - convert Timestamp to string
-            records = []
-            for _, row in df.iterrows():
-                # Convert pandas Timestamp to datetime string for SQLite
-                at_timestamp = row['at']
-                if hasattr(at_timestamp, 'strftime'):
-                    at_timestamp = at_timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                
-                record = (
-                    row.get('reviewId', f"rev_{hash(row['content'])}_{row['at'].timestamp()}"),
-                    row['content'],
-                    row['score'],
-                    row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else row['date'],
-                    at_timestamp,
-                    app_id,
-                    row.get('thumbsUpCount', 0),
-                    batch_date.strftime('%Y-%m-%d')
-                )
-                records.append(record)
-            
-            # Insert or ignore duplicates
-            cursor.executemany('''
-                INSERT OR IGNORE INTO raw_reviews 
-                (review_id, content, score, date, at, app_id, thumbs_up_count, batch_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', records)
-            
-            inserted_count = cursor.rowcount
+            records = self._review_records(df, app_id, batch_date)
+            inserted_count = self._insert_reviews(conn, records)
             
             # Update batch processing status
             cursor.execute('''
@@ -110,18 +112,94 @@ class DataStorage:
             ''', (batch_date.strftime('%Y-%m-%d'), inserted_count, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
             
             conn.commit()
-            conn.close()
+            self.sync_columnar('raw_reviews', {record[3] for record in records})
             
             logger.info(f"Stored {inserted_count} reviews for batch {batch_date}")
             
         except Exception as e:
+            self.db.connection().rollback()
             logger.error(f"Error storing batch {batch_date}: {e}")
             raise
     
+    def bulk_ingest(self, df: pd.DataFrame, app_id: str) -> int:
+        """
+        Backfill path for many days at once: each review's own date is its batch
+        date, and everything is stored in one transaction
+        """
+        if df.empty:
+            return 0
+        
+        try:
+            conn = self.db.connection()
+            records = self._review_records(df, app_id)
+            inserted_count = self._insert_reviews(conn, records)
+            
+            batch_dates = sorted({record[7] for record in records})
+            processed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            conn.executemany('''
+                INSERT OR REPLACE INTO batch_processing 
+                (batch_date, review_count, processed_at)
+                SELECT ?, COUNT(*), ? FROM raw_reviews WHERE batch_date = ?
+            ''', [(batch_date, processed_at, batch_date) for batch_date in batch_dates])
+            
+            conn.commit()
+            self.sync_columnar('raw_reviews', {record[3] for record in records})
+            
+            logger.info(f"Bulk ingest stored {inserted_count} of {len(records)} reviews over {len(batch_dates)} days")
+            return inserted_count
+            
+        except Exception as e:
+            self.db.connection().rollback()
+            logger.error(f"Bulk ingest failed: {e}")
+            raise
+    
+    @staticmethod
+    def _review_records(df: pd.DataFrame, app_id: str, batch_date: date = None) -> List[Tuple]:
+        """raw_reviews rows built column-wise; batch_date defaults to each review's date"""
+        at = pd.to_datetime(df['at'])
+        content = df['content'].astype(str)
+        dates = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        
+        # Stable across processes, unlike hash(); only used when the scraper gave no reviewId
+        content_hash = pd.util.hash_pandas_object(content, index=False).map('{:016x}'.format)
+        epoch_seconds = (at - pd.Timestamp(0, tz=at.dt.tz)) // pd.Timedelta(seconds=1)
+        fallback_ids = 'rev_' + content_hash + '_' + epoch_seconds.astype('Int64').astype(str)
+        review_ids = df['reviewId'].where(df['reviewId'].notna(), fallback_ids) if 'reviewId' in df else fallback_ids
+        
+        columns = [
+            review_ids,
+            content,
+            df['score'],
+            dates,
+            at.dt.strftime('%Y-%m-%d %H:%M:%S'),
+            pd.Series(app_id, index=df.index),
+            df['thumbsUpCount'].fillna(0).astype(int) if 'thumbsUpCount' in df else pd.Series(0, index=df.index),
+            dates if batch_date is None else pd.Series(batch_date.strftime('%Y-%m-%d'), index=df.index)
+        ]
+        # object dtype turns numpy scalars into Python ones sqlite3 can bind; missing values become NULL
+        return list(zip(*(column.astype(object).where(column.notna(), None).tolist() for column in columns)))
+    
+    def _insert_reviews(self, conn: sqlite3.Connection, records: List[Tuple], page_size: int = INGEST_PAGE_ROWS) -> int:
+        """INSERT OR IGNORE in pages inside the caller's transaction; returns the number of new rows"""
+        inserted_count = 0
+        for start in range(0, len(records), page_size):
+            page = records[start:start + page_size]
+            cursor = conn.executemany('''
+                INSERT OR IGNORE INTO raw_reviews 
+                (review_id, content, score, date, at, app_id, thumbs_up_count, batch_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', page)
+            inserted_count += cursor.rowcount
+            
+            if self.near_duplicates:
+                # Same transaction, so the index never drifts from raw_reviews
+                self.near_duplicates.add_reviews(conn, [(record[0], record[1]) for record in page])
+        return inserted_count
+    
     def get_reviews_by_batch_date(self, batch_date: date) -> pd.DataFrame:
         """Get all reviews processed in a specific batch"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.db.connection()
             
             query = """
             SELECT * FROM raw_reviews 
@@ -130,7 +208,6 @@ class DataStorage:
             """
             
             df = pd.read_sql_query(query, conn, params=[batch_date.strftime('%Y-%m-%d')])
-            conn.close()
             
             logger.info(f"Retrieved {len(df)} reviews from batch {batch_date}")
             return df
@@ -142,25 +219,27 @@ class DataStorage:
     def get_reviews_by_date_range(self, start_date: date, end_date: date, app_id: str = None) -> pd.DataFrame:
         """Get reviews for a specific date range"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.db.connection()
             
+            # near_dup_group lets Phase 2 extract each near-duplicate group once
             if app_id:
                 query = """
-                SELECT * FROM raw_reviews 
-                WHERE date BETWEEN ? AND ? AND app_id = ?
-                ORDER BY date DESC, at DESC
+                SELECT r.*, CASE WHEN m.groupable THEN m.group_id END AS near_dup_group FROM raw_reviews r
+                LEFT JOIN review_minhash m ON m.review_id = r.review_id
+                WHERE r.date BETWEEN ? AND ? AND r.app_id = ?
+                ORDER BY r.date DESC, r.at DESC
                 """
                 params = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), app_id]
             else:
                 query = """
-                SELECT * FROM raw_reviews 
-                WHERE date BETWEEN ? AND ?
-                ORDER BY date DESC, at DESC
+                SELECT r.*, CASE WHEN m.groupable THEN m.group_id END AS near_dup_group FROM raw_reviews r
+                LEFT JOIN review_minhash m ON m.review_id = r.review_id
+                WHERE r.date BETWEEN ? AND ?
+                ORDER BY r.date DESC, r.at DESC
                 """
                 params = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
             
             df = pd.read_sql_query(query, conn, params=params)
-            conn.close()
             
             logger.info(f"Retrieved {len(df)} reviews from {start_date} to {end_date}")
             return df
@@ -169,10 +248,149 @@ class DataStorage:
             logger.error(f"Error retrieving reviews: {e}")
             return pd.DataFrame()
     
+    def iter_reviews_by_day(self, start_date: date, end_date: date, window_days: int = 1,
+                            per_day_limit: int = PHASE2_REVIEWS_PER_DAY,
+                            app_id: str = None) -> Iterator[Tuple[date, date, pd.DataFrame]]:
+        """
+        Yield (window_start, window_end, reviews) for consecutive windows of
+        window_days days, oldest first, from a single query. Only the columns
+        topic extraction reads are selected, and each day is capped at its
+        per_day_limit newest reviews in SQL. Empty windows are yielded too.
+        """
+        columns = ['review_id', 'content', 'score', 'date', 'near_dup_group']
+        query = f"""
+        SELECT review_id, content, score, date, near_dup_group FROM (
+            SELECT r.review_id, r.content, r.score, r.date, CASE WHEN m.groupable THEN m.group_id END AS near_dup_group,
+                   ROW_NUMBER() OVER (PARTITION BY r.date ORDER BY r.at DESC) AS day_rank
+            FROM raw_reviews r
+            LEFT JOIN review_minhash m ON m.review_id = r.review_id
+            WHERE r.date BETWEEN ? AND ?{' AND r.app_id = ?' if app_id else ''}
+        )
+        WHERE day_rank <= ?
+        ORDER BY date, day_rank
+        """
+        params = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+        params += [app_id] if app_id else []
+        
+        # The cap bounds the result at days x per_day_limit rows, so it is fetched whole:
+        # no cursor stays open while the caller commits between windows
+        rows = self.db.connection().execute(query, params + [per_day_limit]).fetchall()
+        days = {day: list(day_rows) for day, day_rows in groupby(rows, key=lambda row: row[3])}
+        
+        window_start = start_date
+        while window_start <= end_date:
+            window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+            window_rows = []
+            day = window_start
+            while day <= window_end:
+                window_rows.extend(days.pop(day.strftime('%Y-%m-%d'), []))
+                day += timedelta(days=1)
+            yield window_start, window_end, pd.DataFrame(window_rows, columns=columns)
+            window_start = window_end + timedelta(days=1)
+    
+    def get_near_duplicate_campaigns(self, start_date: date, end_date: date, min_size: int) -> pd.DataFrame:
+        """Near-duplicate groups with at least min_size reviews in the date range (likely copy-paste campaigns)"""
+        return DataStorage.near_duplicate_campaigns(self.db.connection(), start_date, end_date, min_size)
+    
+    @staticmethod
+    def near_duplicate_campaigns(conn: sqlite3.Connection, start_date: date, end_date: date, min_size: int) -> pd.DataFrame:
+        """get_near_duplicate_campaigns() on a caller's connection, without opening a DataStorage"""
+        try:
+            query = """
+            SELECT m.group_id, COUNT(*) AS reviews, MIN(r.date) AS first_seen, MAX(r.date) AS last_seen,
+                   AVG(r.score) AS avg_score,
+                   (SELECT content FROM raw_reviews WHERE review_id = m.group_id) AS sample
+            FROM review_minhash m
+            JOIN raw_reviews r ON r.review_id = m.review_id
+            WHERE r.date BETWEEN ? AND ? AND m.groupable
+            GROUP BY m.group_id
+            HAVING COUNT(*) >= ?
+            ORDER BY reviews DESC
+            """
+            
+            df = pd.read_sql_query(query, conn, params=[start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), min_size])
+            return df
+            
+        except Exception as e:
+            logger.error(f"Error retrieving near-duplicate campaigns: {e}")
+            return pd.DataFrame()
+    
+    def search_reviews(self, text: str = None, start_date: date = None, end_date: date = None,
+                       min_score: int = None, max_score: int = None, topic: str = None,
+                       page: int = 1, page_size: int = REVIEW_SEARCH_PAGE_SIZE) -> pd.DataFrame:
+        """
+        One page of reviews matching every given filter. With text, results are
+        ranked by bm25 and carry a highlighted snippet; without it, newest first.
+        topic is a canonical topic name or any raw name consolidated into it.
+        Invalid arguments raise ValueError; query failures are logged and raised.
+        """
+        try:
+            if page < 1 or page_size < 1:
+                raise ValueError(f"❌ page and page_size must be positive, got {page} and {page_size}")
+            if min_score is not None and max_score is not None and min_score > max_score:
+                raise ValueError(f"❌ min_score {min_score} is above max_score {max_score}")
+            
+            conn = self.db.connection()
+            
+            conditions, params = [], []
+            if start_date:
+                conditions.append('r.date >= ?')
+                params.append(start_date.strftime('%Y-%m-%d'))
+            if end_date:
+                conditions.append('r.date <= ?')
+                params.append(end_date.strftime('%Y-%m-%d'))
+            if min_score is not None:
+                conditions.append('r.score >= ?')
+                params.append(min_score)
+            if max_score is not None:
+                conditions.append('r.score <= ?')
+                params.append(max_score)
+            if topic:
+                # Mentions share their review's date, so the topic lookup is bounded by the same range
+                mention_dates = ''.join(
+                    [' AND p.date >= ?' if start_date else '', ' AND p.date <= ?' if end_date else '']
+                )
+                conditions.append(f"""r.review_id IN (
+                    SELECT p.review_id FROM processed_topics p
+                    WHERE p.topic_id = (SELECT topic_id FROM topic_aliases WHERE alias = ?){mention_dates}
+                )""")
+                params.append(topic)
+                params += [day.strftime('%Y-%m-%d') for day in (start_date, end_date) if day]
+            
+            if text:
+                if not REVIEW_SEARCH_ENABLED:
+                    raise RuntimeError("full-text search is disabled (REVIEW_SEARCH_ENABLED)")
+                query = f"""
+                SELECT r.review_id, r.content, r.score, r.date, r.at, reviews_fts.rank AS rank,
+                       snippet(reviews_fts, 0, '[', ']', '…', 12) AS snippet
+                FROM reviews_fts
+                JOIN raw_reviews r ON r.review_id = reviews_fts.review_id
+                WHERE {' AND '.join(['reviews_fts MATCH ?'] + conditions)}
+                ORDER BY reviews_fts.rank
+                LIMIT ? OFFSET ?
+                """
+                params = [ReviewSearchIndex.match_expression(text)] + params
+            else:
+                query = f"""
+                SELECT r.review_id, r.content, r.score, r.date, r.at
+                FROM raw_reviews r
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY r.date DESC, r.at DESC
+                LIMIT ? OFFSET ?
+                """
+            params += [page_size, (page - 1) * page_size]
+            
+            return pd.read_sql_query(query, conn, params=params)
+            
+        except Exception as e:
+            # An empty page would read as "no matches"; callers must see the failure
+            logger.error(f"Error searching reviews: {e}")
+            raise
+    
     def get_database_stats(self) -> dict:
         """Get database statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.db.connection()
             cursor = conn.cursor()
             
             # Total reviews
@@ -191,7 +409,6 @@ class DataStorage:
             cursor.execute("SELECT app_id, COUNT(*) FROM raw_reviews GROUP BY app_id")
             app_stats = dict(cursor.fetchall())
             
-            conn.close()
             
             stats = {
                 'total_reviews': total_reviews,
@@ -206,12 +423,31 @@ class DataStorage:
             logger.error(f"Error getting stats: {e}")
             return {}
     
+    def sync_columnar(self, table: str, dates: Iterable[str]):
+        """Refresh the Parquet partitions of dates just committed to SQLite"""
+        if self.columnar is None:
+            return
+        try:
+            self.columnar.sync_dates(self.db.connection(), table, dates)
+        except Exception as e:
+            # SQLite already holds the data; export_to_parquet() repairs the copy
+            logger.warning(f"⚠️  Parquet sync of {table} failed: {e}")
+    
+    def export_to_parquet(self):
+        """Full export of raw_reviews and processed_topics to the columnar store"""
+        if self.columnar is None:
+            logger.error("Columnar store unavailable (disabled or pyarrow missing)")
+            return
+        conn = self.db.connection()
+        for table in ('raw_reviews', 'processed_topics'):
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                self.columnar.export_table(conn, table)
+    
     def export_to_csv(self, filepath: str):
         """Export all reviews to CSV"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.db.connection()
             df = pd.read_sql_query("SELECT * FROM raw_reviews ORDER BY date DESC", conn)
-            conn.close()
             
             df.to_csv(filepath, index=False)
             logger.info(f"Exported {len(df)} reviews to {filepath}")
@@ -0,0 +1,235 @@
+import logging
+import hashlib
+import re
+import sqlite3
+import zlib
+import numpy as np
+from typing import List, Dict, Tuple
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import (
+    MINHASH_NUM_PERM, MINHASH_BANDS, NEAR_DUP_THRESHOLD, MINHASH_SHINGLE_WORDS, NEAR_DUP_BUCKET_CANDIDATES,
+    NEAR_DUP_MIN_WORDS
+)
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures with banded LSH buckets stored next to raw_reviews.
+
+    Each insert looks up only the rows sharing one of its band buckets (an
+    indexed equality lookup per band, capped at NEAR_DUP_BUCKET_CANDIDATES
+    rows). A review joins the group of its most similar verified match,
+    otherwise it starts a group named after its own review_id. Only group
+    representatives get bucket rows.
+
+    Texts under NEAR_DUP_MIN_WORDS words ("good", "nice app", emoji-only)
+    are stored with groupable = 0 and no signature: thousands of unrelated
+    reviews share them, so grouping them would report fake campaigns.
+    """
+
+    def __init__(self, num_perm: int = MINHASH_NUM_PERM, bands: int = MINHASH_BANDS,
+                 threshold: float = NEAR_DUP_THRESHOLD, shingle_words: int = MINHASH_SHINGLE_WORDS,
+                 bucket_candidates: int = NEAR_DUP_BUCKET_CANDIDATES, min_words: int = NEAR_DUP_MIN_WORDS):
+        if num_perm % bands:
+            raise ValueError(f"❌ MINHASH_NUM_PERM ({num_perm}) must be divisible by MINHASH_BANDS ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.shingle_words = shingle_words
+        self.bucket_candidates = bucket_candidates
+        self.min_words = min_words
+
+        # Fixed seed: signatures must stay comparable across runs
+        generator = np.random.RandomState(1)
+        self.perm_a = generator.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.perm_b = generator.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+    @staticmethod
+    def setup_tables(cursor: sqlite3.Cursor, min_words: int = NEAR_DUP_MIN_WORDS):
+        had_table = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_minhash'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS review_minhash (
+                review_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                group_id TEXT NOT NULL,
+                groupable BOOLEAN NOT NULL DEFAULT TRUE,
+                FOREIGN KEY (review_id) REFERENCES raw_reviews (review_id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS review_lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                review_id TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON review_lsh_buckets(band, bucket)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_minhash_group ON review_minhash(group_id)')
+
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(review_minhash)')}
+        if had_table and 'groupable' not in columns:
+            cursor.execute('ALTER TABLE review_minhash ADD COLUMN groupable BOOLEAN NOT NULL DEFAULT TRUE')
+            NearDuplicateIndex._ungroup_short_texts(cursor, min_words)
+
+    @staticmethod
+    def _ungroup_short_texts(cursor: sqlite3.Cursor, min_words: int):
+        """Indexes built before the word minimum: take short texts out of their groups once"""
+        rows = cursor.execute('''
+            SELECT m.review_id, r.content FROM review_minhash m
+            JOIN raw_reviews r ON r.review_id = m.review_id
+        ''').fetchall()
+        short = [(review_id,) for review_id, content in rows if len(_WORD.findall(str(content))) < max(min_words, 1)]
+        cursor.executemany(
+            "UPDATE review_minhash SET groupable = FALSE, group_id = review_id, signature = X'' WHERE review_id = ?", short
+        )
+        cursor.executemany('DELETE FROM review_lsh_buckets WHERE review_id = ?', short)
+        logger.info(f"Near-duplicate index: took {len(short)} short reviews out of their groups")
+
+    def is_short(self, text: str) -> bool:
+        """Too few words to group; texts without any word always are"""
+        return len(_WORD.findall(str(text))) < max(self.min_words, 1)
+
+    def _shingles(self, text: str) -> List[str]:
+        words = _WORD.findall(str(text).lower())
+        if not words:
+            raise ValueError("❌ No words to shingle; check is_short() first")
+        if len(words) <= self.shingle_words:
+            return [' '.join(words)]
+        return [' '.join(words[i:i + self.shingle_words]) for i in range(len(words) - self.shingle_words + 1)]
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in set(self._shingles(text))], dtype=np.uint64)
+        permuted = (np.outer(hashes, self.perm_a) + self.perm_b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_buckets(self, signature: np.ndarray) -> List[int]:
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, 'little', signed=True))
+        return buckets
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the two shingle sets"""
+        return float(np.mean(a == b))
+
+    def add_reviews(self, conn: sqlite3.Connection, reviews: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Index (review_id, content) pairs not yet indexed; returns {review_id: group_id} for them"""
+        cursor = conn.cursor()
+        if not reviews:
+            return {}
+
+        known = set()
+        ids = [review_id for review_id, _ in reviews]
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            cursor.execute(f"SELECT review_id FROM review_minhash WHERE review_id IN ({','.join('?' * len(part))})", part)
+            known.update(row[0] for row in cursor.fetchall())
+
+        pending = [(review_id, content) for review_id, content in dict(reviews).items() if review_id not in known]
+        if not pending:
+            return {}
+
+        groups = {}
+        minhash_rows, bucket_rows = [], []
+        short = [review_id for review_id, content in pending if self.is_short(content)]
+        if short:
+            # Stored only so they count as indexed; each stays its own group
+            minhash_rows.extend((review_id, b'', review_id, False) for review_id in short)
+            groups.update((review_id, review_id) for review_id in short)
+            short = set(short)
+            pending = [(review_id, content) for review_id, content in pending if review_id not in short]
+
+        signatures = [self.signature(content) for _, content in pending]
+        buckets = [self.band_buckets(signature) for signature in signatures]
+
+        stored = self._stored_candidates(cursor, buckets) if pending else {}
+
+        batch_buckets: Dict[Tuple[int, int], List[int]] = {}
+        for i, (review_id, _) in enumerate(pending):
+            best_group, best_similarity = review_id, self.threshold
+            for candidate_signature, candidate_group in stored.get(i, []):
+                score = self.similarity(signatures[i], candidate_signature)
+                if score >= best_similarity:
+                    best_group, best_similarity = candidate_group, score
+
+            # Near-copies inside the same batch are grouped too (against this batch's representatives)
+            for band, bucket in enumerate(buckets[i]):
+                for j in batch_buckets.get((band, bucket), []):
+                    score = self.similarity(signatures[i], signatures[j])
+                    if score >= best_similarity:
+                        best_group, best_similarity = groups[pending[j][0]], score
+
+            groups[review_id] = best_group
+            minhash_rows.append((review_id, signatures[i].tobytes(), best_group, True))
+            if best_group == review_id:
+                # New group: this review represents it in the buckets; members are found through it
+                for band, bucket in enumerate(buckets[i]):
+                    batch_buckets.setdefault((band, bucket), []).append(i)
+                    bucket_rows.append((band, bucket, review_id))
+
+        cursor.executemany(
+            'INSERT OR IGNORE INTO review_minhash (review_id, signature, group_id, groupable) VALUES (?, ?, ?, ?)', minhash_rows
+        )
+        cursor.executemany('INSERT INTO review_lsh_buckets (band, bucket, review_id) VALUES (?, ?, ?)', bucket_rows)
+
+        grouped = sum(1 for review_id, group_id in groups.items() if review_id != group_id)
+        logger.info(f"Near-duplicate index: {len(groups)} reviews added, {grouped} joined an existing group")
+        return groups
+
+    def _stored_candidates(self, cursor: sqlite3.Cursor, buckets: List[List[int]]) -> Dict[int, List[Tuple[np.ndarray, str]]]:
+        """Signatures and groups of already-indexed reviews sharing a bucket, per pending position"""
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS lsh_probe (pos INTEGER, band INTEGER, bucket INTEGER)')
+        cursor.execute('DELETE FROM lsh_probe')
+        cursor.executemany(
+            'INSERT INTO lsh_probe (pos, band, bucket) VALUES (?, ?, ?)',
+            [(pos, band, bucket) for pos, row in enumerate(buckets) for band, bucket in enumerate(row)]
+        )
+        # The per-bucket LIMIT bounds the work per probe however crowded a bucket is
+        cursor.execute('''
+            SELECT DISTINCT p.pos, m.signature, m.group_id
+            FROM lsh_probe p
+            JOIN review_lsh_buckets b ON b.rowid IN (
+                SELECT rowid FROM review_lsh_buckets
+                WHERE band = p.band AND bucket = p.bucket
+                LIMIT ?
+            )
+            JOIN review_minhash m ON m.review_id = b.review_id
+        ''', (self.bucket_candidates,))
+        candidates: Dict[int, List[Tuple[np.ndarray, str]]] = {}
+        for pos, signature, group_id in cursor.fetchall():
+            candidates.setdefault(pos, []).append((np.frombuffer(signature, dtype=np.uint32), group_id))
+        cursor.execute('DELETE FROM lsh_probe')
+        return candidates
+
+    def backfill(self, conn: sqlite3.Connection, batch_size: int = 5000) -> int:
+        """Index raw_reviews rows stored before the index existed"""
+        total = 0
+        while True:
+            rows = conn.execute('''
+                SELECT r.review_id, r.content
+                FROM raw_reviews r
+                LEFT JOIN review_minhash m ON m.review_id = r.review_id
+                WHERE m.review_id IS NULL
+                ORDER BY r.at
+                LIMIT ?
+            ''', (batch_size,)).fetchall()
+            if not rows:
+                break
+            self.add_reviews(conn, rows)
+            conn.commit()
+            total += len(rows)
+        return total
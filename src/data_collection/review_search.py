@@ -0,0 +1,92 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+class ReviewSearchIndex:
+    """
+    FTS5 index over raw_reviews.content, kept in sync by triggers so every
+    insert path (daily batches, bulk ingest) indexes in its own transaction.
+
+    The index keeps its own copy of the text and joins back on review_id,
+    because raw_reviews has no INTEGER PRIMARY KEY and VACUUM may renumber
+    its rowids. reviews_fts_map records the FTS rowid of each review, so
+    deletes and updates remove one row by rowid instead of scanning the
+    UNINDEXED review_id column.
+    """
+
+    @staticmethod
+    def setup_tables(cursor: sqlite3.Cursor):
+        """Create the index and triggers; reviews stored before they existed are indexed once"""
+        had_index = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reviews_fts'"
+        ).fetchone()
+        had_map = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reviews_fts_map'"
+        ).fetchone()
+
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+                content,
+                review_id UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reviews_fts_map (
+                review_id TEXT PRIMARY KEY,
+                fts_rowid INTEGER NOT NULL
+            )
+        ''')
+
+        if had_index and not had_map:
+            # Indexes built before the map: map their rows and replace the scanning triggers
+            cursor.execute('INSERT OR REPLACE INTO reviews_fts_map (review_id, fts_rowid) SELECT review_id, rowid FROM reviews_fts')
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS raw_reviews_fts_{trigger}')
+            logger.info(f"Mapped {cursor.execute('SELECT COUNT(*) FROM reviews_fts_map').fetchone()[0]} indexed reviews to FTS rowids")
+
+        # Inside a trigger last_insert_rowid() is the row the trigger just inserted
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS raw_reviews_fts_insert AFTER INSERT ON raw_reviews BEGIN
+                INSERT INTO reviews_fts (content, review_id) VALUES (new.content, new.review_id);
+                INSERT OR REPLACE INTO reviews_fts_map (review_id, fts_rowid) VALUES (new.review_id, last_insert_rowid());
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS raw_reviews_fts_delete AFTER DELETE ON raw_reviews BEGIN
+                DELETE FROM reviews_fts WHERE rowid = (SELECT fts_rowid FROM reviews_fts_map WHERE review_id = old.review_id);
+                DELETE FROM reviews_fts_map WHERE review_id = old.review_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS raw_reviews_fts_update AFTER UPDATE OF content ON raw_reviews BEGIN
+                DELETE FROM reviews_fts WHERE rowid = (SELECT fts_rowid FROM reviews_fts_map WHERE review_id = old.review_id);
+                INSERT INTO reviews_fts (content, review_id) VALUES (new.content, new.review_id);
+                INSERT OR REPLACE INTO reviews_fts_map (review_id, fts_rowid) VALUES (new.review_id, last_insert_rowid());
+            END
+        ''')
+
+        if not had_index:
+            cursor.execute('INSERT INTO reviews_fts (content, review_id) SELECT content, review_id FROM raw_reviews')
+            if cursor.rowcount > 0:
+                logger.info(f"Indexed {cursor.rowcount} existing reviews for full-text search")
+            cursor.execute('INSERT OR REPLACE INTO reviews_fts_map (review_id, fts_rowid) SELECT review_id, rowid FROM reviews_fts')
+
+    @staticmethod
+    def match_expression(text: str) -> str:
+        """
+        Plain search text as an FTS5 query: every word must match, a trailing
+        * keeps prefix search. Quoting stops stray quotes or operators in user
+        input from being parsed as query syntax. Raises ValueError when no
+        searchable word is left.
+        """
+        terms = []
+        for word in text.split():
+            prefix = word.endswith('*') and len(word) > 1
+            word = word.rstrip('*').replace('"', '""')
+            if word:
+                terms.append(f'"{word}"*' if prefix else f'"{word}"')
+        if not terms:
+            raise ValueError(f"❌ No searchable words in {text!r}")
+        return ' '.join(terms)
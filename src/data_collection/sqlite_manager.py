@@ -0,0 +1,138 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterator, Callable, Optional
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from config import (
+    DB_PATH, SQLITE_WAL_ENABLED, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_MB, SQLITE_MMAP_SIZE_MB,
+    SQLITE_BUSY_TIMEOUT_MS, SQLITE_STATEMENT_CACHE_SIZE, SQLITE_WRITE_BUFFER_ROWS
+)
+
+logger = logging.getLogger(__name__)
+
+class SQLiteConnectionManager:
+    """
+    One long-lived connection per thread to a single database file.
+
+    Connections are opened lazily with WAL journaling and tuned pragmas, and
+    keep their prepared-statement cache for the life of the process instead
+    of being rebuilt on every connect/close.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close_all() can run from the main thread
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+            check_same_thread=False
+        )
+        if SQLITE_WAL_ENABLED:
+            mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning(f"⚠️  {self.db_path} stays in {mode} journal mode")
+        conn.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_MB * 1024}')
+        conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Commit on success, roll back on error"""
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+_managers: Dict[str, SQLiteConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+def get_connection_manager(db_path: str = DB_PATH) -> SQLiteConnectionManager:
+    """Shared manager per database file, so every component reuses the same connections"""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = SQLiteConnectionManager(db_path)
+        return _managers[key]
+
+class WriteBehindBuffer:
+    """
+    Collects rows for one INSERT statement and writes them in large
+    transactions. Rows become visible to readers only after flush().
+    on_flush(conn, rows), if given, runs in the same transaction, e.g. to
+    maintain an aggregate of the inserted rows.
+    """
+
+    def __init__(self, manager: SQLiteConnectionManager, statement: str,
+                 flush_rows: int = SQLITE_WRITE_BUFFER_ROWS,
+                 on_flush: Optional[Callable[[sqlite3.Connection, List[Tuple]], None]] = None):
+        self.manager = manager
+        self.statement = statement
+        self.flush_rows = flush_rows
+        self.on_flush = on_flush
+        self._rows: List[Tuple] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, rows: List[Tuple]):
+        with self._lock:
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered in one transaction; returns the row count"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            with self.manager.transaction() as conn:
+                conn.executemany(self.statement, rows)
+                if self.on_flush is not None:
+                    self.on_flush(conn, rows)
+        except Exception as e:
+            # Keep the rows so a later flush can retry them
+            with self._lock:
+                self._rows = rows + self._rows
+            logger.error(f"❌ Write-behind flush of {len(rows)} rows failed: {e}")
+            raise
+        logger.info(f"✅ Flushed {len(rows)} buffered rows")
+        return len(rows)
@@ -0,0 +1,76 @@
+import logging
+import sqlite3
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TopicDailyCounts:
+    """
+    Mentions per (topic_id, date) with the rating of the mentioning reviews,
+    kept next to processed_topics so reports read topics x days rows instead
+    of re-aggregating every stored mention.
+    """
+
+    @staticmethod
+    def setup_tables(cursor: sqlite3.Cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS topic_daily_counts (
+                topic_id INTEGER NOT NULL,
+                date DATE NOT NULL,
+                mentions INTEGER NOT NULL,
+                rating_sum INTEGER NOT NULL DEFAULT 0,
+                rated_mentions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (topic_id, date),
+                FOREIGN KEY (topic_id) REFERENCES topics (topic_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_counts_date ON topic_daily_counts(date)')
+
+    @staticmethod
+    def add_mentions(conn: sqlite3.Connection, mentions: List[Tuple[str, int, str]]):
+        """Add (review_id, topic_id, date) mentions; run inside the transaction that stores them"""
+        cursor = conn.cursor()
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS new_mentions (review_id TEXT, topic_id INTEGER, date DATE)')
+        cursor.execute('DELETE FROM new_mentions')
+        cursor.executemany('INSERT INTO new_mentions (review_id, topic_id, date) VALUES (?, ?, ?)', mentions)
+        cursor.execute('''
+            INSERT INTO topic_daily_counts (topic_id, date, mentions, rating_sum, rated_mentions)
+            SELECT n.topic_id, n.date, COUNT(*), COALESCE(SUM(r.score), 0), COUNT(r.score)
+            FROM new_mentions n
+            LEFT JOIN raw_reviews r ON r.review_id = n.review_id
+            WHERE n.topic_id IS NOT NULL
+            GROUP BY n.topic_id, n.date
+            ON CONFLICT (topic_id, date) DO UPDATE SET
+                mentions = mentions + excluded.mentions,
+                rating_sum = rating_sum + excluded.rating_sum,
+                rated_mentions = rated_mentions + excluded.rated_mentions
+        ''')
+        cursor.execute('DELETE FROM new_mentions')
+
+    @staticmethod
+    def rebuild(conn: sqlite3.Connection) -> int:
+        """Recompute every row from processed_topics inside the caller's transaction; returns the row count"""
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM topic_daily_counts')
+        cursor.execute('''
+            INSERT INTO topic_daily_counts (topic_id, date, mentions, rating_sum, rated_mentions)
+            SELECT p.topic_id, p.date, COUNT(*), COALESCE(SUM(r.score), 0), COUNT(r.score)
+            FROM processed_topics p
+            LEFT JOIN raw_reviews r ON r.review_id = p.review_id
+            WHERE p.topic_id IS NOT NULL
+            GROUP BY p.topic_id, p.date
+        ''')
+        rows = cursor.execute('SELECT COUNT(*) FROM topic_daily_counts').fetchone()[0]
+        logger.info(f"✅ Rebuilt topic_daily_counts: {rows} topic-day rows")
+        return rows
+
+    @staticmethod
+    def ensure_built(conn: sqlite3.Connection):
+        """Build the aggregate once for databases whose mentions predate it"""
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'processed_topics'").fetchone():
+            return
+        has_counts = conn.execute('SELECT 1 FROM topic_daily_counts LIMIT 1').fetchone()
+        has_mentions = conn.execute('SELECT 1 FROM processed_topics WHERE topic_id IS NOT NULL LIMIT 1').fetchone()
+        if has_mentions and not has_counts:
+            TopicDailyCounts.rebuild(conn)
+            conn.commit()
@@ -3,16 +3,21 @@ from datetime import datetime, timedelta
 from typing import List
 import sys
 import os
-import sqlite3
 
 sys.path.append(os.path.dirname(__file__))
 
 from data_collection.data_storage import DataStorage
+from data_collection.sqlite_manager import get_connection_manager, WriteBehindBuffer
+from data_collection.topic_counts import TopicDailyCounts
 from ai_agents.llm_client import LLMClient
 from ai_agents.topic_extractor import TopicExtractionAgent
 from ai_agents.vector_store import TopicVectorStore
 from ai_agents.topic_consolidator import TopicConsolidationAgent
-from config import DB_PATH
+from ai_agents.topic_registry import TopicRegistry
+from ai_agents.seed_classifier import SeedTopicCascade
+from ai_agents.review_index import LabeledReviewIndex
+from ai_agents.review_clusterer import ReviewClusterer
+from config import DB_PATH, CASCADE_ENABLED, KNN_ENABLED, EXTRACTION_MODE, CLUSTER_WINDOW_DAYS
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,16 +33,36 @@ logger = logging.getLogger(__name__)
 class Phase2Processor:
     def __init__(self):
         self.storage = DataStorage()
+        self.db = get_connection_manager(DB_PATH)
         self.llm_client = LLMClient()
         self.vector_store = TopicVectorStore()
-        self.topic_extractor = TopicExtractionAgent(self.llm_client)
-        self.topic_consolidator = TopicConsolidationAgent(self.vector_store)
+        self.topic_extractor = TopicExtractionAgent(self.llm_client, clusterer=ReviewClusterer(self.vector_store))
+        self.review_index = None
+        if KNN_ENABLED:
+            self.review_index = LabeledReviewIndex(self.vector_store)
+            self.topic_extractor.pre_labelers.append(self.review_index)
+        if CASCADE_ENABLED:
+            self.topic_extractor.pre_labelers.append(
+                SeedTopicCascade(self.vector_store, self.topic_extractor.seed_topics)
+            )
         
         self._setup_topic_tables()
+        # Mentions are written in large transactions; nothing reads them back until the run ends
+        self.topic_writer = WriteBehindBuffer(self.db, '''
+            INSERT INTO processed_topics 
+            (review_id, topic_name, topic_category, date, batch_date, is_seed_topic, is_new_topic, topic_id, label_source)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', on_flush=self._count_mentions)
+        self._mention_dates = set()
+        self.topic_registry = TopicRegistry(DB_PATH)
+        TopicDailyCounts.ensure_built(self.db.connection())
+        self.topic_consolidator = TopicConsolidationAgent(self.vector_store, registry=self.topic_registry)
+        if self.review_index is not None:
+            self.review_index.refresh()
     
     def _setup_topic_tables(self):
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = self.db.connection()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -50,30 +75,43 @@ class Phase2Processor:
                     batch_date DATE,
                     is_seed_topic BOOLEAN DEFAULT FALSE,
                     is_new_topic BOOLEAN DEFAULT FALSE,
+                    topic_id INTEGER,
+                    label_source TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (review_id) REFERENCES raw_reviews (review_id)
+                    FOREIGN KEY (review_id) REFERENCES raw_reviews (review_id),
+                    FOREIGN KEY (topic_id) REFERENCES topics (topic_id)
                 )
             ''')
             
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_topic_date ON processed_topics(topic_name, date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_batch_date_topics ON processed_topics(batch_date)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_review_topics ON processed_topics(review_id)')
+            
+            # Databases created before labels recorded where they came from
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(processed_topics)')}
+            if 'label_source' not in columns:
+                cursor.execute('ALTER TABLE processed_topics ADD COLUMN label_source TEXT')
+            
+            TopicDailyCounts.setup_tables(cursor)
             
             conn.commit()
-            conn.close()
             logger.info("✅ Topic tables setup completed")
             
         except Exception as e:
+            self.db.connection().rollback()
             logger.error(f"❌ Topic tables setup failed: {e}")
             raise
     
+    @staticmethod
+    def _count_mentions(conn, records: List[tuple]):
+        # Same transaction as the processed_topics insert, so the aggregate never drifts
+        TopicDailyCounts.add_mentions(conn, [(record[0], record[7], record[3]) for record in records])
+    
     def _store_processed_topics(self, topics_data: List[dict]):
         if not topics_data:
             return
             
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
             records = []
             for topic in topics_data:
                 record = (
@@ -83,19 +121,15 @@ class Phase2Processor:
                     topic['date'],
                     topic.get('batch_date'),
                     topic.get('is_seed_topic', False),
-                    topic.get('is_new_topic', False)
+                    topic.get('is_new_topic', False),
+                    topic.get('topic_id'),
+                    topic.get('label_source')
                 )
                 records.append(record)
+                self._mention_dates.add(topic['date'])
             
-            cursor.executemany('''
-                INSERT INTO processed_topics 
-                (review_id, topic_name, topic_category, date, batch_date, is_seed_topic, is_new_topic)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', records)
-            
-            conn.commit()
-            conn.close()
-            logger.info(f"✅ Stored {len(topics_data)} processed topics")
+            self.topic_writer.add(records)
+            logger.info(f"✅ Queued {len(topics_data)} processed topics ({len(self.topic_writer)} awaiting flush)")
             
         except Exception as e:
             logger.error(f"❌ Error storing processed topics: {e}")
@@ -109,36 +143,76 @@ class Phase2Processor:
         
         batches_processed = 0
         total_topics = 0
+        coverage = {'sent': 0, 'covered_first_pass': 0, 'recovered': 0, 'uncovered': 0}
+        label_split = {'llm': 0}
         
-        current_date = start_date
-        while current_date <= end_date:
-            logger.info(f"📅 Processing batch for {current_date}")
-            
-            daily_reviews = self.storage.get_reviews_by_date_range(current_date, current_date)
-            
-            if not daily_reviews.empty:
-                daily_reviews = daily_reviews.head(100)
-                
-                raw_topics = self.topic_extractor.extract_topics_from_batch(daily_reviews, str(current_date))
-                
-                consolidated_topics = self.topic_consolidator.consolidate_topics(raw_topics)
-                
-                self._store_processed_topics(consolidated_topics)
-                
-                batches_processed += 1
-                total_topics += len(consolidated_topics)
+        # Cluster mode can pool several days so recurring complaints form larger clusters
+        window_days = CLUSTER_WINDOW_DAYS if EXTRACTION_MODE == 'cluster' else 1
+        
+        try:
+            # One capped query over the whole range, split into windows in memory
+            windows = self.storage.iter_reviews_by_day(start_date, end_date, window_days=window_days)
+            for current_date, window_end, daily_reviews in windows:
+                if window_end == current_date:
+                    logger.info(f"📅 Processing batch for {current_date}")
+                else:
+                    logger.info(f"📅 Processing batch for {current_date} to {window_end}")
                 
-                logger.info(f"✅ {current_date}: {len(consolidated_topics)} topics")
-            else:
-                logger.info(f"⏭️  No reviews for {current_date}")
-            
-            current_date += timedelta(days=1)
+                if not daily_reviews.empty:
+                    raw_topics = self.topic_extractor.extract_topics_from_batch(daily_reviews, str(window_end))
+                    
+                    batch_stats = self.topic_extractor.last_batch_stats
+                    for key in coverage:
+                        coverage[key] += batch_stats.get(key, 0)
+                    label_split['llm'] += batch_stats.get('llm_labels', 0)
+                    for name, count in batch_stats.get('local_labels', {}).items():
+                        label_split[name] = label_split.get(name, 0) + count
+                    if batch_stats.get('uncovered_ids'):
+                        logger.warning(f"⚠️  {current_date}: no topics for {batch_stats['uncovered_ids']}")
+                    
+                    consolidated_topics = self.topic_consolidator.consolidate_topics(raw_topics)
+                    
+                    self._store_processed_topics(consolidated_topics)
+                    
+                    if self.review_index is not None:
+                        self.review_index.add_labeled(daily_reviews, consolidated_topics)
+                    
+                    batches_processed += 1
+                    total_topics += len(consolidated_topics)
+                    
+                    logger.info(f"✅ {current_date}: {len(consolidated_topics)} topics")
+                else:
+                    logger.info(f"⏭️  No reviews for {current_date}")
+        finally:
+            # Buffered mentions of completed batches are kept even if a later batch fails
+            self.topic_writer.flush()
+            self.storage.sync_columnar('processed_topics', self._mention_dates)
+            self._mention_dates = set()
+        
+        if self.review_index is not None:
+            self.review_index.save()
         
         logger.info(f"🎉 Phase 2 Completed: {batches_processed} batches, {total_topics} total topics")
+        logger.info(f"🎯 Coverage: {coverage['covered_first_pass']}/{coverage['sent']} reviews first pass, "
+                    f"{coverage['recovered']} recovered on retry, {coverage['uncovered']} uncovered")
+        logger.info(f"🏷️  Label split: {label_split}")
+        
+        cache_stats = self.llm_client.cache_stats()
+        if cache_stats:
+            logger.info(f"💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                        f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries, {cache_stats['size_mb']} MB")
+        
+        if self.vector_store.embedding_cache is not None:
+            embedding_stats = self.vector_store.embedding_cache.stats()
+            logger.info(f"🧠 Embedding cache: {embedding_stats['hits']} hits, {embedding_stats['misses']} misses "
+                        f"({embedding_stats['hit_rate']:.0%}), {embedding_stats['entries']} vectors")
         
         return {
             'batches_processed': batches_processed,
             'total_topics': total_topics,
+            'coverage': coverage,
+            'label_split': label_split,
+            'llm_cache': cache_stats,
             'date_range': {'start': start_date, 'end': end_date}
         }
 
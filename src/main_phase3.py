@@ -1,13 +1,17 @@
+import argparse
 import logging
 import pandas as pd
-import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
 import sys
 import os
 
 sys.path.append(os.path.dirname(__file__))
-from config import DB_PATH, OUTPUT_DIR, TREND_WINDOW_DAYS
+from config import DB_PATH, OUTPUT_DIR, TREND_WINDOW_DAYS, NEAR_DUP_CAMPAIGN_MIN_SIZE
+from data_collection.data_storage import DataStorage
+from data_collection.sqlite_manager import get_connection_manager
+from data_collection.topic_counts import TopicDailyCounts
+from ai_agents.topic_registry import TopicRegistry
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +29,17 @@ class TrendAnalyzer:
         self.db_path = DB_PATH
         self.output_dir = Path(OUTPUT_DIR)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.db = get_connection_manager(self.db_path)
+        
+        # Databases written before the topics dimension or the daily aggregate existed are migrated here
+        conn = self.db.connection()
+        TopicRegistry.setup_tables(conn)
+        TopicDailyCounts.setup_tables(conn.cursor())
+        TopicDailyCounts.ensure_built(conn)
+    
+    def rebuild_daily_counts(self) -> int:
+        with self.db.transaction() as conn:
+            return TopicDailyCounts.rebuild(conn)
     
     def generate_trend_report(self, target_date: datetime.date = None, window_days: int = TREND_WINDOW_DAYS):
         logger.info(f"📊 Generating trend report for last {window_days} days")
@@ -36,21 +51,21 @@ class TrendAnalyzer:
         
         logger.info(f"Date range: {start_date} to {target_date}")
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         
+        # Pre-aggregated per topic and day, so cost follows topics x days rather than stored mentions
         query = """
         SELECT 
-            topic_name,
-            date,
-            COUNT(*) as frequency
-        FROM processed_topics
-        WHERE date BETWEEN ? AND ?
-        GROUP BY topic_name, date
-        ORDER BY topic_name, date
+            t.topic_name,
+            c.date,
+            c.mentions as frequency
+        FROM topic_daily_counts c
+        JOIN topics t ON t.topic_id = c.topic_id
+        WHERE c.date BETWEEN ? AND ?
+        ORDER BY t.topic_name, c.date
         """
         
         df = pd.read_sql_query(query, conn, params=[start_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d')])
-        conn.close()
         
         if df.empty:
             logger.warning("No topic data found for the specified date range")
@@ -74,7 +89,13 @@ class TrendAnalyzer:
         pivot_table.to_csv(output_file)
         logger.info(f"✅ Trend report saved: {output_file}")
         
-        summary = self._generate_summary(pivot_table, start_date, target_date)
+        campaigns = DataStorage.near_duplicate_campaigns(
+            self.db.connection(), start_date, target_date, NEAR_DUP_CAMPAIGN_MIN_SIZE
+        )
+        if not campaigns.empty:
+            logger.warning(f"⚠️  {len(campaigns)} near-duplicate review campaigns in range")
+        
+        summary = self._generate_summary(pivot_table, start_date, target_date, campaigns)
         summary_file = self.output_dir / f'trend_summary_{target_date}.txt'
         with open(summary_file, 'w') as f:
             f.write(summary)
@@ -84,10 +105,11 @@ class TrendAnalyzer:
             'report_file': str(output_file),
             'summary_file': str(summary_file),
             'total_topics': len(pivot_table),
+            'campaigns': len(campaigns),
             'date_range': {'start': start_date, 'end': target_date}
         }
     
-    def _generate_summary(self, pivot_table: pd.DataFrame, start_date, end_date) -> str:
+    def _generate_summary(self, pivot_table: pd.DataFrame, start_date, end_date, campaigns: pd.DataFrame = None) -> str:
         total_topics = len(pivot_table)
         total_mentions = pivot_table.sum().sum()
         
@@ -122,31 +144,45 @@ class TrendAnalyzer:
             recent_count = int(row[recent_col])
             summary += f"\n{i:2d}. {topic:40s} {recent_count:4d} mentions"
         
+        if campaigns is not None and not campaigns.empty:
+            summary += f"""
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+🚩 POSSIBLE REVIEW CAMPAIGNS (near-duplicate groups of {NEAR_DUP_CAMPAIGN_MIN_SIZE}+ reviews):
+"""
+            for i, campaign in enumerate(campaigns.head(10).itertuples(), 1):
+                sample = ' '.join(str(campaign.sample).split())[:60]
+                summary += (f"\n{i:2d}. {campaign.reviews:4d} reviews, {campaign.first_seen} to {campaign.last_seen}, "
+                            f"avg {campaign.avg_score:.1f}★: \"{sample}\"")
+        
         summary += "\n\n" + "═" * 65 + "\n"
         
         return summary
     
     def get_topic_stats(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connection()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT COUNT(DISTINCT topic_name) FROM processed_topics")
-        unique_topics = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM processed_topics")
-        total_mentions = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(DISTINCT topic_id), COALESCE(SUM(mentions), 0) FROM topic_daily_counts")
+        unique_topics, total_mentions = cursor.fetchone()
         
+        # (topic_name, mentions, average rating of the mentioning reviews)
         cursor.execute("""
-            SELECT topic_name, COUNT(*) as count 
-            FROM processed_topics 
-            GROUP BY topic_name 
-            ORDER BY count DESC 
-            LIMIT 10
+            SELECT t.topic_name, m.count, m.avg_rating
+            FROM (
+                SELECT topic_id, SUM(mentions) as count,
+                       ROUND(1.0 * SUM(rating_sum) / NULLIF(SUM(rated_mentions), 0), 2) as avg_rating
+                FROM topic_daily_counts 
+                GROUP BY topic_id 
+                ORDER BY count DESC 
+                LIMIT 10
+            ) m
+            JOIN topics t ON t.topic_id = m.topic_id
+            ORDER BY m.count DESC
         """)
         top_topics = cursor.fetchall()
         
-        conn.close()
-        
         return {
             'unique_topics': unique_topics,
             'total_mentions': total_mentions,
@@ -187,4 +223,10 @@ def run_phase3():
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate the topic trend report')
+    parser.add_argument('--rebuild-counts', action='store_true',
+                        help='recompute topic_daily_counts from processed_topics before reporting')
+    args = parser.parse_args()
+    if args.rebuild_counts:
+        TrendAnalyzer().rebuild_daily_counts()
     run_phase3()
\ No newline at end of file
@@ -0,0 +1,194 @@
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+import sqlite3
+from typing import Dict, Any, Tuple
+from sklearn.cluster import AgglomerativeClustering
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from ai_agents.vector_store import TopicVectorStore
+from ai_agents.seed_classifier import SEED_TOPIC_CATEGORIES
+from ai_agents.topic_registry import TopicRegistry
+from data_collection.topic_counts import TopicDailyCounts
+from data_collection.sqlite_manager import get_connection_manager
+from data_collection.columnar_store import ColumnarStore
+from config import DB_PATH, RECONSOLIDATION_THRESHOLD, COLUMNAR_STORE_ENABLED
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler('topic_reconsolidation.log')
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+class TopicReconsolidator:
+    """
+    Offline, order-independent pass over the whole topic taxonomy: clusters
+    every distinct topic_name and folds each cluster into one canonical name.
+    """
+    
+    def __init__(self, vector_store: TopicVectorStore = None, db_path: str = DB_PATH,
+                 threshold: float = RECONSOLIDATION_THRESHOLD):
+        self.vector_store = vector_store or TopicVectorStore()
+        self.db_path = db_path
+        self.threshold = threshold
+    
+    def _load_topics(self, conn: sqlite3.Connection) -> pd.DataFrame:
+        df = pd.read_sql_query('''
+            SELECT topic_name, topic_category, COUNT(*) AS mentions, MIN(date) AS first_seen
+            FROM processed_topics
+            GROUP BY topic_name, topic_category
+        ''', conn)
+        
+        # One row per name, labelled with its most common category
+        df = df.sort_values('mentions', ascending=False)
+        topics = df.groupby('topic_name', sort=False).agg(
+            topic_category=('topic_category', 'first'),
+            mentions=('mentions', 'sum'),
+            first_seen=('first_seen', 'min')
+        ).reset_index()
+        return topics
+    
+    def plan(self, topics: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Adds cluster and canonical columns to the distinct-topic frame; also returns its embeddings"""
+        embeddings = self.vector_store.encode_topics(topics['topic_name'].tolist())
+        
+        if len(topics) > 1:
+            topics['cluster'] = AgglomerativeClustering(
+                n_clusters=None,
+                metric='cosine',
+                linkage='average',
+                distance_threshold=1 - self.threshold
+            ).fit_predict(embeddings)
+        else:
+            topics['cluster'] = 0
+        
+        # Canonical: a seed topic if the cluster has one, else the most mentioned, earliest, shortest name
+        topics['is_seed'] = topics['topic_name'].isin(SEED_TOPIC_CATEGORIES)
+        topics['name_length'] = topics['topic_name'].str.len()
+        ranked = topics.sort_values(
+            ['cluster', 'is_seed', 'mentions', 'first_seen', 'name_length'],
+            ascending=[True, False, False, True, True]
+        )
+        canonical = ranked.groupby('cluster').first()
+        topics['canonical'] = topics['cluster'].map(canonical['topic_name'])
+        topics['canonical_category'] = topics['cluster'].map(canonical['topic_category'])
+        topics['embedding_row'] = np.arange(len(topics))
+        return topics, embeddings
+    
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        # Shared per-thread connection: not closed here, other components keep using it
+        conn = get_connection_manager(self.db_path).connection()
+        topics = self._load_topics(conn)
+        if topics.empty:
+            logger.warning("No topics in processed_topics, nothing to re-consolidate")
+            return {'topics_before': 0, 'topics_after': 0, 'renamed_mentions': 0}
+        
+        logger.info(f"🔎 Clustering {len(topics)} distinct topics at cosine >= {self.threshold}")
+        topics, embeddings = self.plan(topics)
+        
+        merges = topics[topics['topic_name'] != topics['canonical']]
+        result = {
+            'topics_before': len(topics),
+            'topics_after': topics['canonical'].nunique(),
+            'renamed_mentions': int(merges['mentions'].sum())
+        }
+        
+        for canonical, group in merges.groupby('canonical'):
+            logger.info(f"  {canonical} ← {', '.join(group['topic_name'])}")
+        
+        if dry_run:
+            logger.info(f"🧪 Dry run: {result['topics_before']} → {result['topics_after']} topics, "
+                        f"{result['renamed_mentions']} mentions would be renamed")
+            return result
+        
+        self._rewrite_mentions(conn, topics)
+        if COLUMNAR_STORE_ENABLED and ColumnarStore.available():
+            # Renamed mentions can sit in any partition
+            ColumnarStore().export_table(conn, 'processed_topics')
+        
+        # Only after the database commit: the canonical set is derivable from processed_topics, so a
+        # failure here is repaired by re-running the job
+        canonical_rows = topics[topics['topic_name'] == topics['canonical']]
+        self.vector_store.replace_topics(
+            canonical_rows['topic_name'].tolist(), embeddings[canonical_rows['embedding_row'].to_numpy()]
+        )
+        
+        logger.info(f"🎉 Re-consolidated {result['topics_before']} → {result['topics_after']} topics, "
+                    f"{result['renamed_mentions']} mentions renamed")
+        return result
+    
+    def _rewrite_mentions(self, conn: sqlite3.Connection, topics: pd.DataFrame):
+        """Rename all merged mentions in a single transaction"""
+        mapping = topics[['topic_name', 'canonical', 'canonical_category']]
+        mapping = mapping[mapping['topic_name'] != mapping['canonical']]
+        try:
+            TopicRegistry.setup_tables(conn)
+            cursor = conn.cursor()
+            cursor.execute('CREATE TEMP TABLE topic_renames (raw TEXT PRIMARY KEY, canonical TEXT, category TEXT)')
+            cursor.executemany('INSERT INTO topic_renames VALUES (?, ?, ?)', mapping.itertuples(index=False, name=None))
+            cursor.execute('''
+                UPDATE processed_topics
+                SET topic_category = (SELECT category FROM topic_renames WHERE raw = processed_topics.topic_name),
+                    topic_name = (SELECT canonical FROM topic_renames WHERE raw = processed_topics.topic_name)
+                WHERE topic_name IN (SELECT raw FROM topic_renames)
+            ''')
+            logger.info(f"✅ Renamed {cursor.rowcount} mentions")
+            
+            # Keep the topics dimension in step: aliases of merged topics now point at the canonical id
+            cursor.execute('''
+                CREATE TEMP TABLE topic_id_renames AS
+                SELECT old.topic_id AS old_id, new.topic_id AS new_id
+                FROM topic_renames r
+                JOIN topics old ON old.topic_name = r.raw
+                JOIN topics new ON new.topic_name = r.canonical
+            ''')
+            for table in ('topic_aliases', 'processed_topics'):
+                cursor.execute(f'''
+                    UPDATE {table}
+                    SET topic_id = (SELECT new_id FROM topic_id_renames WHERE old_id = {table}.topic_id)
+                    WHERE topic_id IN (SELECT old_id FROM topic_id_renames)
+                ''')
+            cursor.execute('DELETE FROM topics WHERE topic_id IN (SELECT old_id FROM topic_id_renames)')
+            cursor.execute('''
+                UPDATE topics
+                SET topic_category = (SELECT category FROM topic_renames WHERE canonical = topics.topic_name LIMIT 1)
+                WHERE topic_name IN (SELECT canonical FROM topic_renames)
+            ''')
+            cursor.execute('DROP TABLE topic_id_renames')
+            cursor.execute('DROP TABLE topic_renames')
+            
+            # Merged topics' daily counts now belong to the canonical id
+            TopicDailyCounts.setup_tables(cursor)
+            TopicDailyCounts.rebuild(conn)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Re-consolidation rolled back: {e}")
+            raise
+
+def run_reconsolidation(threshold: float = RECONSOLIDATION_THRESHOLD, dry_run: bool = False):
+    print("🧹 Topic Taxonomy Re-consolidation")
+    print("=" * 60)
+    
+    result = TopicReconsolidator(threshold=threshold).run(dry_run=dry_run)
+    
+    print(f"📉 Topics: {result['topics_before']} → {result['topics_after']}")
+    print(f"✏️  Mentions renamed: {result['renamed_mentions']}{' (dry run)' if dry_run else ''}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Merge near-duplicate topics across all processed days')
+    parser.add_argument('--threshold', type=float, default=RECONSOLIDATION_THRESHOLD,
+                        help='cosine similarity at which topics are merged')
+    parser.add_argument('--dry-run', action='store_true', help='log planned merges without writing')
+    args = parser.parse_args()
+    run_reconsolidation(args.threshold, args.dry_run)